@@ -0,0 +1,271 @@
+###
+# Benchmarks the main operations of the simulations over instances of increasing n
+# Records the time and peak memory of each operation, fits scaling curves, compares them against a saved baseline
+# and checks that the competitive ratios still match the golden results in results/metric/
+###
+
+import io
+import os
+import json
+import time
+import argparse
+import platform
+import tracemalloc
+import contextlib
+import numpy as np
+from colorama import Fore
+from datetime import datetime
+from modules.Dataset import load_weights
+from modules.GraphAP import GraphAP
+from modules.GraphML import GraphML
+from modules.MetricSpace import is_synthetic
+from modules.ResultsStore import read_text_results
+import main
+
+
+DATASETS_DIR = "../datasets"		# Relative path
+GOLDEN_DIR = "../results/metric"		# Relative path
+BASELINE_FILE = "../results/benchmarks/baseline.json"		# Relative path
+RESULTS_FILE = "../results/benchmarks/latest.json"		# Relative path
+
+SYNTHETIC_SIZES = [1000, 2000, 5000]
+GOLDEN_SEED = 2344367245		# Seed of the golden results
+QUICK_GOLDEN_FILES = ["metric100.txt", "metric200.txt", "metric300.txt"]
+GRAPH_LIMIT = 800		# NetworkX graphs are only built up to this n (they need O(n²) Python objects)
+BENCHMARK_SEED = 7
+DELTA = 0.5
+EPSILON = 0.3
+K = 30
+REGRESSION_THRESHOLD = 1.25		# A time above 125% of the baseline is reported as a regression
+
+# Golden chunks that the original code does not reproduce either (a mismatch is reported but does not fail the gate)
+# semionline metric700.txt: the published results differ from every run of the original code at the last digits
+# (e.g. δ = 0 gives 0.9999999999999998, the file has 0.9999999999999993)
+KNOWN_DIVERGENT = {("semionline", "metric700.txt")}
+
+
+## Times an operation
+## Input: operation 'function' (no arguments), number of timed runs 'repeat', peak memory toggle 'memory'
+## Output: dictionary of the best and median time (seconds) and the peak traced memory (MB) of a single run
+def measure(function, repeat, memory=True):
+	times = []
+	for _ in range(repeat):
+		start = time.perf_counter()
+		function()
+		times.append(time.perf_counter() - start)
+
+	peak = None
+	if memory:
+		# Separate run, since tracing the allocations slows the operation down
+		tracemalloc.start()
+		function()
+		peak = tracemalloc.get_traced_memory()[1] / 2 ** 20
+		tracemalloc.stop()
+
+	return {"best": min(times), "median": float(np.median(times)), "peak_mb": peak}
+
+
+## Benchmarks every operation on a single instance
+## Input: dataset path or synthetic source spec 'source', number of timed runs 'repeat'
+## Output: dictionary operation -> measurements
+def benchmark_instance(source, repeat):
+	operations = {}
+	synthetic = is_synthetic(source)
+
+	# Cold construction solves the optimum (Karp), warm construction reads it from the optimum cache
+	if synthetic:
+		operations["load"] = measure(lambda: GraphML.from_synthetic(source, use_cache=False), repeat)
+		G = GraphML.from_synthetic(source)
+		operations["load_warm"] = measure(lambda: GraphML.from_synthetic(source), repeat)
+	else:
+		operations["parse"] = measure(lambda: load_weights(source, use_cache=False, progress=False), repeat)
+		operations["load"] = measure(lambda: load_weights(source, progress=False), repeat)
+		weights = load_weights(source, progress=False)
+		operations["construct"] = measure(lambda: GraphML.from_matrix(weights, use_cache=False), repeat)
+		G = GraphML(source)
+		operations["construct_warm"] = measure(lambda: GraphML(source), repeat)
+
+	operations["optimal_matching"] = measure(lambda: GraphAP.get_optimal_matching(G.weights), repeat)
+
+	def run_semionline():
+		G.flush()
+		main.semionline(G, DELTA, np.random.RandomState(BENCHMARK_SEED))
+	operations["semionline"] = measure(run_semionline, repeat)
+
+	rng = np.random.RandomState(BENCHMARK_SEED)
+	operations["perturbed_weights"] = measure(lambda: G.generate_perturbed_weights(DELTA, EPSILON, K, rng=rng), repeat)
+	if G.n <= GRAPH_LIMIT:
+		operations["perturbed_graph"] = measure(lambda: G.generate_perturbed_graph(DELTA, EPSILON, K, rng=rng), 1, memory=False)
+
+	predicted_weights = G.generate_perturbed_weights(DELTA, EPSILON, K, rng=rng)
+	operations["rmsd"] = measure(lambda: G.calculate_rmsd(predicted_weights), repeat)
+
+	return {"n": G.n, "operations": operations}
+
+
+## Fits time = c * n^exponent for every operation (least squares on the log-log scale)
+## Output: dictionary operation -> exponent
+def fit_scaling(instances):
+	samples = {}
+	for instance in instances.values():
+		for operation, measurements in instance["operations"].items():
+			samples.setdefault(operation, []).append((instance["n"], measurements["best"]))
+
+	exponents = {}
+	for operation, points in samples.items():
+		n, seconds = np.array(points).T
+		if len(set(n)) >= 2 and (seconds > 0).all():
+			exponents[operation] = float(np.polyfit(np.log(n), np.log(seconds), 1)[0])
+	return exponents
+
+
+## Compares the best times against a baseline
+## Output: list of (instance, operation, current seconds, baseline seconds, ratio) of the common measurements
+def compare_results(results, baseline):
+	comparisons = []
+	for name, instance in results["instances"].items():
+		baseline_instance = baseline["instances"].get(name)
+		if baseline_instance is None:
+			continue
+
+		for operation, measurements in instance["operations"].items():
+			baseline_measurements = baseline_instance["operations"].get(operation)
+			if baseline_measurements is None:
+				continue
+			ratio = measurements["best"] / baseline_measurements["best"]
+			comparisons.append((name, operation, measurements["best"], baseline_measurements["best"], ratio))
+	return comparisons
+
+
+## Reads the golden results of an algorithm
+## Output: dictionary file -> list of result tuples (only the results of GOLDEN_SEED)
+def read_golden_results(algorithm):
+	golden = {}
+	for header, result in read_text_results(rel2abs_path(GOLDEN_DIR, f"{algorithm}_metric.txt")):
+		if header["seed"] == GOLDEN_SEED:
+			golden[header["file"]] = result
+	return golden
+
+
+## Checks that the simulations still reproduce the golden results exactly
+## Input: file names of the datasets to check 'file_names'
+## Output: list of (algorithm, file, passed)
+def check_golden_results(file_names):
+	checks = []
+	settings = [("semionline", main.FINE_DELTA_OPTIONS, main.simulate_semionline, GraphAP),
+		("semionlineML", main.DELTA_OPTIONS, main.simulate_semionlineML, GraphML)]
+
+	for algorithm, delta_options, simulate, graph_class in settings:
+		golden = read_golden_results(algorithm)
+		for file_name in file_names:
+			if file_name not in golden:
+				continue
+
+			main.DELTA_OPTIONS, default_options = delta_options, main.DELTA_OPTIONS
+			try:
+				with contextlib.redirect_stdout(io.StringIO()):
+					G = graph_class(rel2abs_path(DATASETS_DIR, file_name))
+					result = simulate(G, GOLDEN_SEED)
+			finally:
+				main.DELTA_OPTIONS = default_options
+
+			expected = [tuple(data) for data in golden[file_name]]
+			actual = [tuple(float(d) for d in data) for data in result]
+			checks.append((algorithm, file_name, actual == expected))
+	return checks
+
+
+## Converts a relative (to this file) path to an absolute path
+## Input: directory containing file 'rel_dir', raw 'file_name'
+## Output: absolute path to a single file
+def rel2abs_path(rel_dir, file_name):
+	dir = os.path.dirname(__file__)
+	rel_path = os.path.join(dir, rel_dir, file_name)
+	return os.path.abspath(rel_path)
+
+
+if __name__ == "__main__":
+	# Parameters
+	parser = argparse.ArgumentParser()
+
+	parser.add_argument("-n", "--sizes", type=int, nargs="*", default=SYNTHETIC_SIZES,
+			help="Sizes of the synthetic instances (in addition to the shipped datasets)")
+	parser.add_argument("--datasets", nargs="*", default=None,
+			help="Dataset files to benchmark (default: every file in datasets/)")
+	parser.add_argument("-r", "--repeat", type=int, default=3,
+			help="Number of timed runs of each operation (the best one is compared)")
+	parser.add_argument("-o", "--output", default=rel2abs_path('.', RESULTS_FILE),
+			help="Path of the JSON results")
+	parser.add_argument("--baseline", default=rel2abs_path('.', BASELINE_FILE),
+			help="Baseline JSON results to compare against")
+	parser.add_argument("--save-baseline", action='store_true',
+			help="Save the results as the new baseline")
+	parser.add_argument("--gate", choices=["none", "quick", "full"], default="quick",
+			help="Golden results check (quick: n <= 300, full: every shipped dataset; a mismatch of the known divergent "
+			"semionline metric700.txt results is reported without failing)")
+
+	args = parser.parse_args()
+
+	if args.datasets is None:
+		datasets_dir = rel2abs_path('.', DATASETS_DIR)
+		args.datasets = [os.path.join(datasets_dir, file) for file in sorted(os.listdir(datasets_dir), key=lambda f: (len(f), f))
+			if file.endswith(main.VALID_EXT)]
+	sources = args.datasets + [f"synthetic:n={n},seed={BENCHMARK_SEED}" for n in args.sizes]
+
+	# Correctness gate
+	failed = False
+	if args.gate != "none":
+		print("=== Golden results ===")
+		file_names = QUICK_GOLDEN_FILES if args.gate == "quick" else [os.path.basename(file) for file in args.datasets]
+		for algorithm, file_name, passed in check_golden_results(file_names):
+			known = (algorithm, file_name) in KNOWN_DIVERGENT
+			if passed:
+				status = f"{Fore.GREEN}OK{Fore.WHITE}"
+			elif known:
+				status = f"{Fore.YELLOW}MISMATCH (known divergence, see KNOWN_DIVERGENT){Fore.WHITE}"
+			else:
+				status = f"{Fore.RED}MISMATCH{Fore.WHITE}"
+			print(f"{algorithm}\t{file_name}\t{status}")
+			failed |= not (passed or known)
+
+	# Benchmarks
+	results = {
+		"created": datetime.now().isoformat(timespec="seconds"),
+		"machine": {"platform": platform.platform(), "python": platform.python_version(), "numpy": np.__version__,
+			"cpus": os.cpu_count()},
+		"repeat": args.repeat,
+		"instances": {},
+	}
+	for source in sources:
+		name = source if is_synthetic(source) else os.path.basename(source)
+		print(f"=== {name} ===")
+		instance = benchmark_instance(source, args.repeat)
+		results["instances"][name] = instance
+		for operation, measurements in instance["operations"].items():
+			peak = f"{measurements['peak_mb']:.1f} MB" if measurements["peak_mb"] is not None else "-"
+			print(f"{operation:<20}{measurements['best'] * 1000:>10.2f} ms\t{peak}")
+
+	results["scaling"] = fit_scaling(results["instances"])
+	print("=== Scaling (time ~ n^x) ===")
+	for operation, exponent in results["scaling"].items():
+		print(f"{operation:<20}{exponent:.2f}")
+
+	# Baseline comparison
+	if os.path.isfile(args.baseline) and not args.save_baseline:
+		with open(args.baseline, "r") as f:
+			baseline = json.load(f)
+
+		print(f"=== Baseline ({baseline['created']}) ===")
+		for name, operation, seconds, baseline_seconds, ratio in compare_results(results, baseline):
+			color = Fore.RED if ratio > REGRESSION_THRESHOLD else Fore.GREEN if ratio < 1 / REGRESSION_THRESHOLD else Fore.WHITE
+			print(f"{name:<28}{operation:<20}{baseline_seconds * 1000:>10.2f} -> {seconds * 1000:>10.2f} ms\t{color}{ratio:.2f}x{Fore.WHITE}")
+
+	# Stores results
+	output = rel2abs_path('.', BASELINE_FILE) if args.save_baseline else args.output
+	os.makedirs(os.path.dirname(output), exist_ok=True)
+	with open(output, "w") as f:
+		json.dump(results, f, indent=1)
+	print(f"{Fore.GREEN}Results saved in {output}{Fore.WHITE}")
+
+	if failed:
+		raise SystemExit(f"{Fore.RED}Golden results mismatch!{Fore.WHITE}")
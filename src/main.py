@@ -3,18 +3,33 @@
 ###
 
 import os
+import io
+import time
 import argparse
 import random
+import cProfile
+import contextlib
 import numpy as np
 from colorama import Fore
 from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
 from modules.GraphAP import GraphAP
 from modules.GraphML import GraphML
+from modules.Dataset import read_binary_weights, load_weights
+from modules.MetricSpace import is_synthetic, parse_synthetic_spec, generate_synthetic_points, get_weight_matrix
+from modules.Evaluation import indices_to_permutation, get_matching_sums, are_valid_matchings
+from modules.ResultsStore import ResultsStore, Checkpoint, RESULT_COLUMNS
+from modules.RandomStreams import get_cell_rng, get_legacy_rng, is_generator
+from modules import Instrumentation
+from modules import Kernels
+from modules import IncrementalAssignment
 
 
 SEED = [637534]		# Fallback seed
-RESULTS_FILE = "../preliminary_results.txt"		# Relative path
-VALID_EXT = ('.txt')		# Valid input file extensions
+RESULTS_FILE = "../preliminary_results.txt"		# Relative path (legacy text results)
+RESULTS_DB = "../results.db"		# Relative path
+VALID_EXT = ('.txt', '.npy')		# Valid input file extensions (.npy: binary dataset)
+RNG_MODE = "legacy"		# "legacy": reseeds np.random per cell (published results), "stream": independent generators
 
 
 ## Parameter Options ##
@@ -23,7 +38,109 @@ EPSILON_OPTIONS = [0, 0.1, 0.2, 0.3, 0.4, 0.5]
 K_OPTIONS = [10, 30, 50]
 DELTA_OPTIONS = [0, 0.25, 0.5, 0.75, 1]		# 0 => no unknowns, 1 => all unknown (δ - proportion of adversarial)
 
-# DELTA_OPTIONS = [0, 0.05, 0.1, 0.15, 0.2, 0.25, 0.3, 0.35, 0.4, 0.45, 0.5, 0.55, 0.6, 0.65, 0.7, 0.75, 0.8, 0.85, 0.9, 0.95, 1]
+CHECKPOINT_CELLS = 6		# Predicted matchings are checkpointed in groups of this many cells
+
+FINE_DELTA_OPTIONS = [0, 0.05, 0.1, 0.15, 0.2, 0.25, 0.3, 0.35, 0.4, 0.45, 0.5, 0.55, 0.6, 0.65, 0.7, 0.75, 0.8, 0.85, 0.9, 0.95, 1]
+
+## Returns the random generator of a single simulation cell
+## Input: graph 'G', base 'seed', cell parameters 'params' (e.g. δ, ε, k), 
+##        toggle for a private copy of the legacy random state 'independent' (used by batched replicates)
+def get_rng(G: GraphAP, seed, *params, independent=False):
+	if RNG_MODE == "legacy":
+		return np.random.RandomState(seed) if independent else get_legacy_rng(seed)
+	return get_cell_rng(seed, G.name, *params)
+
+#region =====Predicted Matchings=====
+
+## Solves the predicted (perturbed) matching of every (δ, ε, k) cell of a seed
+## Input: GraphML class 'G', base 'seed', list of (δ, ε, k) 'cells'
+## Output: (cells x n) LHS-indexed permutations of the predicted matchings, RMSD of each predicted graph
+def solve_predicted_matchings(G: GraphML, seed, cells):
+	buffer = np.empty_like(G.weights)		# Reused for every predicted graph
+	permutations = np.empty((len(cells), G.n), dtype=int)
+	rmsds = []
+
+	for i, (d, e, k) in enumerate(cells):
+		with Instrumentation.scope(delta=d, epsilon=e, k=k):
+			rng = get_rng(G, seed, d, e, k)
+
+			with Instrumentation.timer("perturb"):
+				predicted_weights = G.generate_perturbed_weights(d, e, k, buffer, rng)
+			with Instrumentation.timer("predicted_solve"):
+				row_ind, col_ind, _ = GraphML.solve_assignment(predicted_weights)
+			permutations[i] = indices_to_permutation(row_ind, col_ind, G.n)
+			with Instrumentation.timer("rmsd"):
+				rmsds.append(G.calculate_rmsd(predicted_weights))
+
+	return permutations, rmsds
+
+
+## Evaluates the predicted matchings of all the cells at once
+## Output: sums of the matchings (using the true weights), empirical competitive ratios
+def evaluate_predicted_matchings(G: GraphML, permutations):
+	with Instrumentation.timer("evaluate"):
+		if not are_valid_matchings(permutations).all():
+			print(f"{Fore.RED}Error: Graph was not completely matched{Fore.WHITE}")
+
+		predicted_sums = get_matching_sums(G.weights, permutations)
+	return predicted_sums, predicted_sums / G.karp_sum
+
+
+## Simulates the predicted matchings of the cells of a seed, checkpointing every CHECKPOINT_CELLS finished cells
+## Cells finished by a previous (resumed) run are read from the checkpoint instead
+## Input: GraphML class 'G', simulated 'algorithm', base 'seed', list of (δ, ε, k) 'cells'
+## Output: RMSD, sum of the predicted matching (None if resumed) and empirical competitive ratio of each cell
+def simulate_predicted_cells(G: GraphML, algorithm, seed, cells):
+	finished = checkpoint.load(algorithm, G.name, seed) if checkpoint else {}
+	outcomes = {}
+	for cell in cells:
+		stored = finished.get(get_cell_key(algorithm, *cell))
+		if stored is not None:
+			outcomes[cell] = (stored[-2], None, stored[-1])
+
+	pending = [cell for cell in cells if cell not in outcomes]
+	for start in range(0, len(pending), CHECKPOINT_CELLS):
+		group = pending[start:start + CHECKPOINT_CELLS]
+		permutations, rmsds = solve_predicted_matchings(G, seed, group)
+		predicted_sums, competitive_ratios = evaluate_predicted_matchings(G, permutations)
+
+		for i, cell in enumerate(group):
+			outcomes[cell] = (rmsds[i], predicted_sums[i], competitive_ratios[i])
+		if checkpoint:
+			result = [get_cell_data(algorithm, cell, *outcomes[cell][::2]) for cell in group]
+			checkpoint.save(algorithm, G.name, G.n, [(seed, result)])
+
+	rmsds, predicted_sums, competitive_ratios = zip(*(outcomes[cell] for cell in cells))
+	return rmsds, predicted_sums, competitive_ratios
+
+#endregion
+
+#region =====Checkpoints=====
+
+checkpoint = None		# Checkpoint of the finished cells (None unless results are saved in the database)
+
+
+## Key of a cell in the checkpoint (parameters that are not stored for the algorithm are None)
+def get_cell_key(algorithm, delta=None, epsilon=None, k=None):
+	columns = RESULT_COLUMNS[algorithm]
+	return tuple(value if name in columns else None for name, value in (("delta", delta), ("epsilon", epsilon), ("k", k)))
+
+
+## Result tuple of a cell (columns of RESULT_COLUMNS[algorithm])
+## Input: simulated 'algorithm', (δ, ε, k) 'cell', RMSD of the predicted graph 'rmsd', empirical competitive 'ratio'
+def get_cell_data(algorithm, cell, rmsd, ratio):
+	values = dict(zip(("delta", "epsilon", "k"), cell), rmsd=rmsd, ratio=ratio)
+	return tuple(values[column] for column in RESULT_COLUMNS[algorithm])
+
+
+## Displays the sum of a matching over the optimal sum (resumed cells only have their ratio)
+def display_matching_sum(G: GraphAP, matching_sum):
+	if matching_sum is None:
+		print(f"{Fore.YELLOW}(Resumed){Fore.WHITE}")
+	else:
+		print(matching_sum, "/", G.karp_sum)
+
+#endregion
 
 #region =====OnlineML=====
 
@@ -31,24 +148,22 @@ def simulate_onlineML(G: GraphML, seed):
 	print(f"=== n: {G.n}, seed: {seed} ===")
 	competitive_ratio_results = []
 
-	for e in EPSILON_OPTIONS:
-		for k in K_OPTIONS:
-			np.random.seed(seed)
+	cells = [(1, e, k) for e in EPSILON_OPTIONS for k in K_OPTIONS]
+	rmsds, predicted_sums, competitive_ratios = simulate_predicted_cells(G, "onlineML", seed, cells)
 
-			predicted_graph = G.generate_perturbed_graph(1, e, k)
-			predicted_matching = GraphML.get_optimal_matching(predicted_graph)
-			predicted_sum = G.get_projected_matching_sum(predicted_matching)
-			rmsd = G.calculate_rmsd(predicted_graph)
+	for i, (_, e, k) in enumerate(cells):
+		rmsd = rmsds[i]
+		predicted_sum = predicted_sums[i]
 
-			# Consolidate Results
-			empirical_competitive_ratio = predicted_sum / G.karp_sum
-			data = (e, k, rmsd, empirical_competitive_ratio)
-			competitive_ratio_results.append(data)
+		# Consolidate Results
+		empirical_competitive_ratio = competitive_ratios[i]
+		data = (e, k, rmsd, empirical_competitive_ratio)
+		competitive_ratio_results.append(data)
 
-			# Display results
-			print(f"ε: {e:.2f} | k: {k} | rmsd: {rmsd:.2f}")
-			print(predicted_sum, "/", G.karp_sum)
-			print(empirical_competitive_ratio)
+		# Display results
+		print(f"ε: {e:.2f} | k: {k} | rmsd: {rmsd:.2f}")
+		display_matching_sum(G, predicted_sum)
+		print(empirical_competitive_ratio)
 
 	# Display summarized results
 	print(f"===Summary===")
@@ -64,31 +179,138 @@ def simulate_onlineML(G: GraphML, seed):
 #region =====Semionline=====
 
 ## Performs semi-online matching on a graph
-## Input: GraphAP class 'graphAP', proportion of unknown 'delta'
+## Input: GraphAP class 'graphAP', proportion of unknown 'delta', random generator 'rng'
 ## Output: one-way matching dictionary
-def semionline(graphAP: GraphAP, delta):
+def semionline(graphAP: GraphAP, delta, rng=np.random):
+	if Kernels.ENABLED:
+		lookup = graphAP.generate_lookup_array(delta, rng=rng)
+		draws = rng.random(graphAP.n) if is_generator(rng) else None
+		matching = greedy_compiled(graphAP, lookup, graphAP.matched, graphAP.cursors, rng, draws)
+		return GraphAP.indices_to_matching(matching, np.arange(graphAP.n), graphAP.n)
+
 	matching = {}
-	lookup = graphAP.generate_lookup_table(delta)
+	lookup = graphAP.generate_lookup_table(delta, rng=rng)
+
+	# Independent generators draw all the tie-breaks of the greedy phase at once
+	draws = rng.random(graphAP.n) if is_generator(rng) else [None] * graphAP.n
 
 	# Pre-emptively marks all the nodes in lookup to reserve them
 	for v, u in lookup.items():
 		graphAP.set_matched(u, v)
 
 	# Matching
-	for v in range(graphAP.n, 2 * graphAP.n):
-		if v in lookup:
-			# Matching already exists
-			u = lookup[v]
-			matching[v] = u
-		else:
-			# Randomized Greedy Algorithm
-			u = graphAP.get_closest(v)
-			matching[v] = u
-			graphAP.set_matched(u, v)
+	Instrumentation.count("greedy_queries", graphAP.n - len(lookup))
+	with Instrumentation.timer("greedy"):
+		for v in range(graphAP.n, 2 * graphAP.n):
+			if v in lookup:
+				# Matching already exists
+				u = lookup[v]
+				matching[v] = u
+			else:
+				# Randomized Greedy Algorithm
+				u = graphAP.get_closest(v, rng, draws[v - graphAP.n])
+				matching[v] = u
+				graphAP.set_matched(u, v)
 
 	return matching
 
 
+## Compiled lookup reservation and greedy phase of semionline (see Kernels.py)
+## Arrivals that need the legacy random state (ties without pre-drawn numbers) are handled here, in Python
+## Input: GraphAP class 'graphAP', lookup array 'lookup' (see generate_lookup_array), matched mask 'matched' (2n),
+##        scan positions 'cursors' (2n), random generator 'rng', pre-drawn tie-breaks 'draws' (None for legacy)
+## Output: matching[v - n] -> LHS node matched to RHS node v
+def greedy_compiled(graphAP: GraphAP, lookup, matched, cursors, rng, draws=None):
+	n = graphAP.n
+	matching = np.full(n, -1, dtype=int)
+	draws = np.empty(0) if draws is None else draws
+	arguments = (graphAP.sorted_edges, graphAP.group_ends, cursors, matched, lookup, matching, draws)
+
+	Kernels.reserve_lookup(lookup, matched)
+	Instrumentation.count("greedy_queries", int((lookup < 0).sum()))
+	with Instrumentation.timer("greedy"):
+		column = Kernels.greedy_arrivals(*arguments, 0)
+		while column < n:
+			v = column + n
+			neighbours = graphAP.sorted_edges[v]
+			if matched[neighbours[cursors[v]:]].all():
+				raise Exception(f"{Fore.RED}Error: match for node {v} not found!{Fore.WHITE}")
+
+			# Randomized Greedy Algorithm (the kernel stopped with the cursor on the tied group)
+			first = cursors[v]
+			candidates = neighbours[first:graphAP.group_ends[v][first]]
+			u = rng.choice(candidates[~matched[candidates]])
+			matching[column] = u
+			matched[u] = True
+			matched[v] = True
+			column = Kernels.greedy_arrivals(*arguments, column + 1)
+
+	return matching
+
+
+## Performs semi-online matching on S replicates of a graph in lockstep (one replicate per generator)
+## Each replicate draws the same random numbers as semionline() would, so the matchings are identical
+## Input: GraphAP class 'graphAP', proportion of unknown 'delta', random generators 'rngs'
+## Output: matchings[s][v - n] -> LHS node matched to RHS node v, matched mask (S x 2n)
+def semionline_batch(graphAP: GraphAP, delta, rngs):
+	n = graphAP.n
+	replicates = np.arange(len(rngs))
+	matched = np.zeros((len(rngs), 2 * n), dtype=bool)
+	matchings = np.full((len(rngs), n), -1, dtype=int)
+
+	lookups = np.stack([graphAP.generate_lookup_array(delta, rng=rng) for rng in rngs])
+	draws = [rng.random(n) if is_generator(rng) else None for rng in rngs]
+
+	if Kernels.ENABLED:
+		# Replicates are independent, so the compiled kernel simply runs them one after the other
+		for s, rng in enumerate(rngs):
+			matchings[s] = greedy_compiled(graphAP, lookups[s], matched[s], np.zeros(2 * n, dtype=int), rng, draws[s])
+		return matchings, matched
+
+	# Pre-emptively marks all the nodes in the lookups to reserve them
+	is_known = lookups >= 0
+	known_replicates, known_columns = np.nonzero(is_known)
+	matched[known_replicates, lookups[is_known]] = True
+	matched[known_replicates, known_columns + n] = True
+	matchings[is_known] = lookups[is_known]
+
+	# Matching (Randomized Greedy Algorithm on the replicates without a lookup entry)
+	Instrumentation.count("greedy_queries", int((~is_known).sum()))
+	with Instrumentation.timer("greedy"):
+		for v in range(n, 2 * n):
+			active = replicates[~is_known[:, v - n]]
+			if len(active) == 0:
+				continue
+
+			neighbours = graphAP.sorted_edges[v]
+			unmatched = ~matched[active][:, neighbours]
+			first = unmatched.argmax(axis=1)
+			if not unmatched[np.arange(len(active)), first].all():
+				raise Exception(f"{Fore.RED}Error: match for node {v} not found!{Fore.WHITE}")
+
+			choices = neighbours[first]
+
+			# Breaks ties within the closest equal-weight group
+			# Note: a single candidate is returned without drawing (same as rng.choice)
+			ends = graphAP.group_ends[v][first]
+			for t in np.flatnonzero(ends - first > 1):
+				s = active[t]
+				candidates = neighbours[first[t]:ends[t]]
+				candidates = candidates[~matched[s, candidates]]
+				if len(candidates) == 1:
+					choices[t] = candidates[0]
+				elif draws[s] is not None:
+					choices[t] = candidates[int(draws[s][v - n] * len(candidates))]
+				else:
+					choices[t] = rngs[s].choice(candidates)
+
+			matched[active, choices] = True
+			matched[active, v] = True
+			matchings[active, v - n] = choices
+
+	return matchings, matched
+
+
 ## Base function for semionline matching [SEEDED]
 ## Input: absolute path to input 'file_path'
 ## Output: Dictionary of {delta: empirical c. ratio}
@@ -96,37 +318,109 @@ def simulate_semionline(G: GraphAP, seed):
 	print(f"=== n: {G.n}, seed: {seed} ===")
 	competitive_ratio_results = []
 
+	finished = checkpoint.load("semionline", G.name, seed) if checkpoint else {}
 	for delta in DELTA_OPTIONS:
-		np.random.seed(seed)
-		G.flush()
-		semionline_matching = semionline(G, delta)
-		semionline_sum = G.get_projected_matching_sum(semionline_matching)
-
-		# Consolidate results
-		is_valid = G.is_matched_completely()
-		if not is_valid:
-			print(f"{Fore.RED}Error: Graph was not completely matched{Fore.WHITE}") 
-		empirical_competitive_ratio = semionline_sum / G.karp_sum
-		data = (delta, empirical_competitive_ratio)
-		competitive_ratio_results.append(data)
+		stored = finished.get(get_cell_key("semionline", delta))
+		if stored is not None:
+			data = display_semionline_result(G, delta, None, True, stored[-1])
+			competitive_ratio_results.append(data)
+			continue
+
+		with Instrumentation.scope(delta=delta):
+			rng = get_rng(G, seed, delta)
+			G.flush()
+			semionline_matching = semionline(G, delta, rng)
+			with Instrumentation.timer("evaluate"):
+				semionline_sum = G.get_projected_matching_sum(semionline_matching)
+				is_valid = G.is_matched_completely()
+
+			# Consolidate results
+			data = display_semionline_result(G, delta, semionline_sum, is_valid)
+			competitive_ratio_results.append(data)
+			if checkpoint:
+				checkpoint.save("semionline", G.name, G.n, [(seed, [data])])
 
-		# Display results
-		valid_text = f"{Fore.GREEN}(Valid){Fore.WHITE}" if is_valid \
-		 	else f"{Fore.RED}(INVALID){Fore.WHITE}"
+	display_semionline_summary(competitive_ratio_results)
+	return competitive_ratio_results
 
-		print(f"Delta: {delta:.2f} {valid_text}")
-		print(semionline_sum, "/", G.karp_sum)
-		print(empirical_competitive_ratio)
 
-	# Display summarized results
+## Batched version of simulate_semionline (all seeds advance together)
+## Output: list of simulate_semionline results, one per seed
+def simulate_semionline_batch(G: GraphAP, seeds):
+	matching_sums = {}
+	valid_flags = {}
+
+	finished = [checkpoint.load("semionline", G.name, seed) if checkpoint else {} for seed in seeds]
+
+	for delta in DELTA_OPTIONS:
+		key = get_cell_key("semionline", delta)
+		pending = [i for i in range(len(seeds)) if key not in finished[i]]
+		matching_sums[delta] = [None] * len(seeds)
+		valid_flags[delta] = [True] * len(seeds)
+		if not pending:
+			continue
+
+		with Instrumentation.scope(delta=delta):
+			rngs = [get_rng(G, seeds[i], delta, independent=True) for i in pending]
+			matchings, matched = semionline_batch(G, delta, rngs)
+
+			with Instrumentation.timer("evaluate"):
+				pending_sums = get_matching_sums(G.weights, matchings, rhs=True)
+				pending_flags = matched.all(axis=1)
+
+		for i, matching_sum, is_valid in zip(pending, pending_sums, pending_flags):
+			matching_sums[delta][i] = matching_sum
+			valid_flags[delta][i] = is_valid
+		if checkpoint:
+			checkpoint.save("semionline", G.name, G.n,
+				[(seeds[i], [(delta, matching_sums[delta][i] / G.karp_sum)]) for i in pending])
+
+	results = []
+	for i, seed in enumerate(seeds):
+		print(f"=== n: {G.n}, seed: {seed} ===")
+		competitive_ratio_results = []
+
+		for delta in DELTA_OPTIONS:
+			stored = finished[i].get(get_cell_key("semionline", delta))
+			ratio = stored[-1] if stored is not None else None
+			data = display_semionline_result(G, delta, matching_sums[delta][i], valid_flags[delta][i], ratio)
+			competitive_ratio_results.append(data)
+
+		display_semionline_summary(competitive_ratio_results)
+		results.append(competitive_ratio_results)
+		if i < len(seeds) - 1:
+			print("")
+
+	return results
+
+
+## Displays the result of a single delta
+## Input: matching sum 'semionline_sum' (None with the 'stored_ratio' of a resumed cell)
+## Output: (delta, empirical c. ratio)
+def display_semionline_result(G: GraphAP, delta, semionline_sum, is_valid, stored_ratio=None):
+	if not is_valid:
+		print(f"{Fore.RED}Error: Graph was not completely matched{Fore.WHITE}") 
+	empirical_competitive_ratio = semionline_sum / G.karp_sum if semionline_sum is not None else stored_ratio
+
+	# Display results
+	valid_text = f"{Fore.GREEN}(Valid){Fore.WHITE}" if is_valid \
+	 	else f"{Fore.RED}(INVALID){Fore.WHITE}"
+
+	print(f"Delta: {delta:.2f} {valid_text}")
+	display_matching_sum(G, semionline_sum)
+	print(empirical_competitive_ratio)
+
+	return (delta, empirical_competitive_ratio)
+
+
+## Displays summarized results
+def display_semionline_summary(competitive_ratio_results):
 	print(f"===Summary===")
 	# summarized_results = {d: round(c, 3) for d, c in competitive_ratio_results.items()}
 	summarized_results = [(d, round(c, 3)) for d, c in competitive_ratio_results]
 	print("Delta\tEmpirical C. Ratio")
 	for d, c in summarized_results:
 		print(f"{d}\t{c}")
-
-	return competitive_ratio_results
 	
 #endregion
 
@@ -136,26 +430,22 @@ def simulate_semionlineML(G: GraphML, seed):
 	print(f"=== n: {G.n}, seed: {seed} ===")
 	competitive_ratio_results = []
 
-	for d in DELTA_OPTIONS:
-		for e in EPSILON_OPTIONS:
-			for k in K_OPTIONS:
-				np.random.seed(seed)
+	cells = [(d, e, k) for d in DELTA_OPTIONS for e in EPSILON_OPTIONS for k in K_OPTIONS]
+	rmsds, predicted_sums, competitive_ratios = simulate_predicted_cells(G, "semionlineML", seed, cells)
 
-				predicted_graph = G.generate_perturbed_graph(d, e, k)
-				
-				predicted_matching = GraphML.get_optimal_matching(predicted_graph)
-				predicted_sum = G.get_projected_matching_sum(predicted_matching)
-				rmsd = G.calculate_rmsd(predicted_graph)
+	for i, (d, e, k) in enumerate(cells):
+		rmsd = rmsds[i]
+		predicted_sum = predicted_sums[i]
 
-				# Consolidate Results
-				empirical_competitive_ratio = predicted_sum / G.karp_sum
-				data = (d, e, k, rmsd, empirical_competitive_ratio)
-				competitive_ratio_results.append(data)
+		# Consolidate Results
+		empirical_competitive_ratio = competitive_ratios[i]
+		data = (d, e, k, rmsd, empirical_competitive_ratio)
+		competitive_ratio_results.append(data)
 
-				# Display results
-				print(f"δ: {d:.2f} | ε: {e:.2f} | k: {k} | rmsd: {rmsd:.2f}")
-				print(predicted_sum, "/", G.karp_sum)
-				print(empirical_competitive_ratio)
+		# Display results
+		print(f"δ: {d:.2f} | ε: {e:.2f} | k: {k} | rmsd: {rmsd:.2f}")
+		display_matching_sum(G, predicted_sum)
+		print(empirical_competitive_ratio)
 
 	# Display summarized results
 	print(f"===Summary===")
@@ -168,6 +458,98 @@ def simulate_semionlineML(G: GraphML, seed):
 
 #endregion
 
+#region Parallel Execution
+
+graphs = {}		# Graph of the file currently simulated by this process (at most one entry), keyed by file path
+
+
+## Loads a graph once per process and file (tasks are ordered file by file, so only the last graph is kept)
+## Input: simulated algorithm 'algorithm', absolute path to input 'file_path', binary cache toggles
+def get_graph(algorithm, file_path, use_cache=True, rebuild_cache=False):
+	if file_path not in graphs:
+		graphs.clear()		# Frees the previous graph before loading the next one
+		graph_class = GraphAP if algorithm == "semionline" else GraphML
+		with Instrumentation.scope(file=os.path.basename(file_path)):
+			if is_synthetic(file_path):
+				graphs[file_path] = graph_class.from_synthetic(file_path, use_cache, rebuild_cache)
+			else:
+				graphs[file_path] = graph_class(file_path, use_cache, rebuild_cache)
+	return graphs[file_path]
+
+
+## Runs the simulations of a (file, seeds) task
+## Seeds are simulated one at a time, except for batched (semionline) tasks
+## Input: tuple of (algorithm, file_path, seeds, use_cache, batched), output capture toggle 'capture'
+## Output: list of results (one per seed), runtime of each seed (seconds, None if resumed since part of the seed
+##         was simulated by a previous run), captured output (empty if not captured),
+##         instrumentation records (empty unless profiling)
+def run_task(task, capture=True):
+	algorithm, file_path, seeds, use_cache, batched = task
+	file_name = os.path.basename(file_path)
+	output = io.StringIO()
+	results = []
+	runtimes = []
+
+	with contextlib.redirect_stdout(output) if capture else contextlib.nullcontext():
+		G = get_graph(algorithm, file_path, use_cache)
+		if batched and algorithm == "semionline":
+			with Instrumentation.scope(file=file_name, seed=",".join(map(str, seeds))):
+				start = time.perf_counter()
+				results = simulate_semionline_batch(G, seeds)
+				runtimes = [(time.perf_counter() - start) / len(seeds)] * len(seeds)
+			print("")
+
+		else:
+			for seed in seeds:
+				with Instrumentation.scope(file=file_name, seed=seed):
+					start = time.perf_counter()
+					if algorithm == "semionline":
+						result = simulate_semionline(G, seed)
+					elif algorithm == "onlineML":
+						result = simulate_onlineML(G, seed)
+					elif algorithm == "semionlineML":
+						result = simulate_semionlineML(G, seed)
+					runtimes.append(time.perf_counter() - start)
+				print("")
+				results.append(result)
+
+		if checkpoint:
+			runtimes = [None if (algorithm, G.name, seed) in checkpoint.resumed else runtime
+				for seed, runtime in zip(seeds, runtimes)]
+
+	return results, runtimes, output.getvalue(), Instrumentation.collect()
+
+
+## Initializes the parameter options of a worker process
+## Input: delta options, random generator mode, instrumentation toggles 'profile' and 'track_memory',
+##        checkpoint settings (database path, resume and overwrite toggles) or None, compiled kernels toggle 'use_jit',
+##        warm start toggle 'warm_start'
+def init_worker(delta_options, rng_mode, profile=False, track_memory=False, checkpoint_settings=None, use_jit=True,
+		warm_start=False):
+	global DELTA_OPTIONS, RNG_MODE, checkpoint
+	DELTA_OPTIONS = delta_options
+	RNG_MODE = rng_mode
+	Kernels.enable(use_jit)
+	IncrementalAssignment.enable(warm_start)
+	Instrumentation.reset()		# Measurements inherited from the parent are reported by the parent
+	if profile:
+		Instrumentation.enable(track_memory)
+	if checkpoint_settings:
+		checkpoint = Checkpoint(*checkpoint_settings)
+
+
+## Runs the tasks in a pool of 'jobs' processes
+## Output: generator of (task, results, runtimes, captured output, instrumentation records) in the same order as 'tasks'
+def run_parallel(tasks, jobs):
+	checkpoint_settings = (checkpoint.db_path, checkpoint.resume, checkpoint.overwrite) if checkpoint else None
+	initargs = (DELTA_OPTIONS, RNG_MODE, Instrumentation.ENABLED, Instrumentation.TRACK_MEMORY, checkpoint_settings,
+		Kernels.ENABLED, IncrementalAssignment.ENABLED)
+	with ProcessPoolExecutor(max_workers=jobs, initializer=init_worker, initargs=initargs) as executor:
+		for task, (results, runtimes, output, records) in zip(tasks, executor.map(run_task, tasks)):
+			yield task, results, runtimes, output, records
+
+#endregion
+
 #region Results Storing
 
 ## Converts a relative (to this file) path to an absolute path
@@ -179,12 +561,23 @@ def rel2abs_path(rel_dir, file_name):
 	return os.path.abspath(rel_path)
 
 
-## Appends results in the RESULTS_FILE
+## Stores the results of a task in the results database (single transaction)
+## Input: ResultsStore 'store', task tuple 'task' (see run_task), its results and runtimes,
+##        replace stored cells toggle 'overwrite'
+def store_results(store: ResultsStore, task, results, runtimes, overwrite=False):
+	algorithm, file_path, seeds = task[:3]
+	n = get_partition_size(file_path)
+	file_name = os.path.basename(file_path)
+
+	store.insert_results([(file_name, n, seed, algorithm, result, runtime)
+		for seed, result, runtime in zip(seeds, results, runtimes)], overwrite)
+
+
+## Appends results in the RESULTS_FILE (legacy text format)
 ## Result must be a tuple of alphanumeric strings
 def store_result(file_path, result, seed):
 	# Stored data: File name, date, seed, n, results
-	with open(file_path, "r") as f1:
-		n = int(f1.readline())
+	n = get_partition_size(file_path)
 	file_name = os.path.basename(file_path)
 	time = datetime.now().strftime("%d %B %Y, %H:%M:%S")
 	header = f"> {file_name} | {time} | Seed={seed} | n={n}\n"
@@ -198,6 +591,28 @@ def store_result(file_path, result, seed):
 			entry = "\t\t".join(str(data) for data in result[i])
 			f2.write(f"{entry}\n")
 
+
+## Writes the instrumentation report and displays the total time of each phase
+def store_profile(file_path, report):
+	print("===Profile===")
+	print("Phase\t\tCalls\tSeconds")
+	for phase, (calls, seconds) in Instrumentation.get_phase_totals(report).items():
+		print(f"{phase:<16}{calls}\t{seconds:.3f}")
+
+	Instrumentation.write_report(file_path, report)
+	print(f"{Fore.GREEN}Profile saved in {file_path}{Fore.WHITE}")
+
+
+## Reads 'n' from the header of a dataset
+def get_partition_size(file_path):
+	if is_synthetic(file_path):
+		return parse_synthetic_spec(file_path)["n"]
+	if file_path.endswith(".npy"):
+		return read_binary_weights(file_path).shape[0]
+
+	with open(file_path, "r") as f:
+		return int(f.readline())
+
 #endregion
 
 if __name__ == "__main__":
@@ -207,9 +622,42 @@ if __name__ == "__main__":
 	parser.add_argument("algorithm", choices=["onlineML", "semionline", "semionlineML"],
 			help="Type of Assignment Problem to simulate")
 	parser.add_argument("path", 
-			help="Directory/File to use as input")
+			help="Directory/File to use as input, or an in-memory instance 'synthetic:n=<n>[,seed=<seed>][,radius=<radius>]'")
 	parser.add_argument("-S", "--save", action='store_true',
-            help="Toggle to append the result(s) in the results file")
+            help="Toggle to store the result(s) in the results database")
+	parser.add_argument("--text", action='store_true',
+			help="Append the saved result(s) to the legacy text results file instead of the database")
+	stored_group = parser.add_mutually_exclusive_group()
+	stored_group.add_argument("--resume", action='store_true',
+			help="Skip the cells already stored in the results database (e.g. by an interrupted sweep)")
+	stored_group.add_argument("--overwrite", action='store_true',
+			help="Replace the cells already stored in the results database (by default, stored seeds are an error)")
+	parser.add_argument("-f", "--fine", action='store_true',
+			help="Use the fine-grained delta options (steps of 0.05)")
+	parser.add_argument("-b", "--batch", type=int, default=1,
+			help="Number of seeds simulated together by the batched semionline engine (semionline only)")
+	parser.add_argument("--rng", choices=["legacy", "stream"], default=RNG_MODE,
+			help="legacy: reseed the global random state per cell (reproduces published results), "
+			"stream: independent generator per (seed, file, δ, ε, k)")
+	parser.add_argument("-j", "--jobs", type=int, default=1,
+			help="Number of worker processes (0 uses all CPUs)")
+
+	parser.add_argument("--profile", metavar="REPORT",
+			help="Write the time spent in each phase per (file, seed, cell) to a JSON (or .csv) report")
+	parser.add_argument("--profile-memory", action='store_true',
+			help="Also trace the peak Python memory of each record with tracemalloc (slower)")
+	parser.add_argument("--warm-start", action='store_true',
+			help="Repair the optimum of the full problem to solve the lookup subproblems (see modules/IncrementalAssignment.py)")
+	parser.add_argument("--no-jit", action='store_true',
+			help="Use the NumPy implementation even if Numba is installed (see modules/Kernels.py)")
+	parser.add_argument("--cprofile", metavar="STATS",
+			help="Write cProfile statistics of the whole run (requires --jobs 1)")
+
+	cache_group = parser.add_mutually_exclusive_group()
+	cache_group.add_argument("--rebuild-cache", action='store_true',
+			help="Re-parse the input file(s) and overwrite their binary cache")
+	cache_group.add_argument("--no-cache", action='store_true',
+			help="Always parse the input file(s) and never read/write the binary cache")
 
 	seed_group = parser.add_mutually_exclusive_group()
 	seed_group.add_argument("-s", "--seeds", type=int, nargs="+",
@@ -220,6 +668,20 @@ if __name__ == "__main__":
 	args = parser.parse_args()
 
 	# Process arguments
+	if args.fine:
+		DELTA_OPTIONS = FINE_DELTA_OPTIONS
+	RNG_MODE = args.rng
+
+	if args.batch > 1 and args.algorithm != "semionline":
+		raise Exception(f"{Fore.RED}--batch is only supported by semionline{Fore.WHITE}")
+	if args.cprofile and args.jobs != 1:
+		raise Exception(f"{Fore.RED}--cprofile requires --jobs 1{Fore.WHITE}")
+	if args.profile:
+		Instrumentation.enable(args.profile_memory)
+	Kernels.enable(not args.no_jit)
+	IncrementalAssignment.enable(args.warm_start)
+	report = []		# Instrumentation records of every task
+
 	seeds = []
 	if args.random:
 		for i in range(args.random):
@@ -229,7 +691,11 @@ if __name__ == "__main__":
 
 	input_files = []
 	path = os.path.abspath(args.path)
-	if os.path.isfile(path):
+	if is_synthetic(args.path):
+		# Path argument is an in-memory instance
+		parse_synthetic_spec(args.path)
+		input_files.append(args.path)
+	elif os.path.isfile(path):
 		# Path argument is a file
 		input_files.append(path)
 	elif os.path.isdir(path):
@@ -242,32 +708,87 @@ if __name__ == "__main__":
 		raise Exception(f"{Fore.RED}Invalid path argument!{Fore.WHITE}")
 
 	# Run simulations
-	for file in input_files:
-		# Create GraphAP
-		print(f"=== File: {os.path.basename(file)} ===")
-
-		if args.algorithm == "semionline":
-			G = GraphAP(file)
-			for seed in seeds:
-				result = simulate_semionline(G, seed)
-				print("")
-
-				# Stores results
-				if args.save:
-					store_result(file, result, seed)
-		else:
-			G = GraphML(file)
-			for seed in seeds:
-				if args.algorithm == "onlineML":
-					result = simulate_onlineML(G, seed)
-				elif args.algorithm == "semionlineML":
-					result = simulate_semionlineML(G, seed)
-				print("")
+	# Each task simulates a chunk of seeds (a single seed unless batched)
+	use_cache = not args.no_cache
+	chunk_size = max(args.batch, 1)
+	seed_chunks = [seeds[i:i + chunk_size] for i in range(0, len(seeds), chunk_size)]
+	tasks = [(args.algorithm, file, chunk, use_cache, args.batch > 1) for file in input_files for chunk in seed_chunks]
+
+	store = ResultsStore(rel2abs_path('.', RESULTS_DB)) if args.save and not args.text else None
+	if (args.resume or args.overwrite) and not store:
+		raise Exception(f"{Fore.RED}--resume/--overwrite require saving the results in the database (-S without --text){Fore.WHITE}")
+	if store and not (args.resume or args.overwrite):
+		# Stored cells are never replaced silently
+		for file in input_files:
+			stored_seeds = store.get_stored_seeds(args.algorithm, os.path.basename(file), seeds)
+			if stored_seeds:
+				raise Exception(f"{Fore.RED}{os.path.basename(file)}: results of seed(s) {sorted(stored_seeds)} are already "
+					f"stored, use --resume to skip their cells or --overwrite to replace them{Fore.WHITE}")
+	if store:
+		# Finished cells are checkpointed as they are computed, so an interrupted sweep can be resumed
+		checkpoint = Checkpoint(store.db_path, args.resume, args.overwrite)
+	profiler = cProfile.Profile() if args.cprofile else None
+	if profiler:
+		profiler.enable()
+
+	## Stores the results of a finished task
+	def save(task, results, runtimes):
+		if store:
+			store_results(store, task, results, runtimes, args.overwrite)
+		elif args.save:
+			for seed, result in zip(task[2], results):
+				store_result(task[1], result, seed)
+
+	if args.jobs == 1:
+		for file in input_files:
+			# Create GraphAP
+			print(f"=== File: {os.path.basename(file)} ===")
+			get_graph(args.algorithm, file, use_cache, args.rebuild_cache)
+
+			for chunk in seed_chunks:
+				task = (args.algorithm, file, chunk, use_cache, args.batch > 1)
+				results, runtimes, _, records = run_task(task, capture=False)
+				report += records
 
 				# Stores results
-				if args.save:
-					store_result(file, result, seed)
-
-	if args.save:
-			print(f"{Fore.GREEN}Results saved in {rel2abs_path('.', RESULTS_FILE)}{Fore.WHITE}")
+				save(task, results, runtimes)
+	else:
+		# Builds the binary caches beforehand so the workers memory-map them instead of parsing text
+		# and read the optimal matching from the optimum cache instead of each solving it again
+		# (only the weights and the optimum are computed here, not the graphs)
+		if use_cache:
+			for file in input_files:
+				with Instrumentation.scope(file=os.path.basename(file)):
+					if is_synthetic(file):
+						weights = get_weight_matrix(*generate_synthetic_points(file))
+					else:
+						weights = load_weights(file, rebuild=args.rebuild_cache)
+					GraphAP.get_optimum(weights, rebuild_cache=args.rebuild_cache)
+					del weights
+		report += Instrumentation.collect()
+
+		current_file = None
+		for task, results, runtimes, output, records in run_parallel(tasks, args.jobs or os.cpu_count()):
+			report += records
+			file = task[1]
+			if file != current_file:
+				print(f"=== File: {os.path.basename(file)} ===")
+				current_file = file
+			print(output, end="")
+
+			# Stores results
+			save(task, results, runtimes)
+
+	if profiler:
+		profiler.disable()
+		profiler.dump_stats(args.cprofile)
+		print(f"{Fore.GREEN}cProfile statistics saved in {args.cprofile}{Fore.WHITE}")
+	if args.profile:
+		store_profile(args.profile, report)
+
+	if store:
+		store.close()
+		print(f"{Fore.GREEN}Results saved in {rel2abs_path('.', RESULTS_DB)}{Fore.WHITE}")
+	elif args.save:
+		print(f"{Fore.GREEN}Results saved in {rel2abs_path('.', RESULTS_FILE)}{Fore.WHITE}")
 	
\ No newline at end of file
@@ -1,33 +1,41 @@
 ###
 # Generates a dataset in R2 Euclidean space
+# Distances are computed and written in blocks of rows, so memory stays bounded for large n
 ###
 
-import math
 import argparse
 import numpy as np
-import matplotlib.pyplot as plt
 from colorama import Fore
+from modules.MetricSpace import MAX_RADIUS, generate_points, generate_weight_blocks
 
-MAX_RADIUS = 50
 
+## Saves the dataset in the text format (first line is 'n', followed by n lines of n space-separated weights)
+def save_text(path, n, weight_blocks):
+	with open(path, "w") as f:
+		f.write(f"{n}\n")
 
-## Generates a list of uniformly distributed set of points inside a circle
-def generate_points(max_radius, count):
-	angle = np.random.uniform(0, 2 * np.pi, count)
-	radius = (np.random.uniform(size=count) ** 0.5) * max_radius
+		for _, weights in weight_blocks:
+			lines = (" ".join(map(str, row)) for row in weights.tolist())
+			f.write("\n".join(lines))
+			f.write("\n")
 
-	x = radius * np.cos(angle)
-	y = radius * np.sin(angle)
 
-	return (x, y)
+## Saves the dataset as a binary (.npy) n x n matrix, which can be loaded directly by the simulations
+def save_binary(path, n, weight_blocks):
+	weights = np.lib.format.open_memmap(path, mode="w+", dtype=float, shape=(n, n))
+	for start, block in weight_blocks:
+		weights[start:start + len(block)] = block
+	weights.flush()
+	del weights
 
 
-## Get distance between 2 (x, y)-points
-def get_distance(pointA, pointB):
-		x_dist = abs(pointA[0] - pointB[0])
-		y_dist = abs(pointA[1] - pointB[1])
+## Visualizes both sets of points
+def plot_points(pointsU, pointsV):
+	import matplotlib.pyplot as plt
 
-		return math.sqrt(math.pow(x_dist, 2) + math.pow(y_dist, 2))
+	plt.scatter(pointsU[0], pointsU[1], s=5, c="r")
+	plt.scatter(pointsV[0], pointsV[1], s=5, c="b")
+	plt.show()
 
 
 if __name__ == "__main__":
@@ -38,34 +46,31 @@ if __name__ == "__main__":
 			help="Number of nodes in a partition")
 	parser.add_argument("path",
 			help="Path to store edges")
+	parser.add_argument("-s", "--seed", type=int, default=None,
+			help="Seed of the generated points")
+	parser.add_argument("--format", choices=["text", "npy"], default="text",
+			help="Dataset file format (npy: binary matrix)")
+	parser.add_argument("--no-plot", action='store_true',
+			help="Do not visualize the generated points")
 
 	args = parser.parse_args()
-	
+
+	if args.seed is not None:
+		np.random.seed(args.seed)
+
 	# Generates 2 sets of points
 	pointsU = generate_points(MAX_RADIUS, args.n)
 	pointsV = generate_points(MAX_RADIUS, args.n)
 
 	# Visualize data
-	plt.scatter(pointsU[0], pointsU[1], s=5, c="r")
-	plt.scatter(pointsV[0], pointsV[1], s=5, c="b")
-	plt.show()
+	if not args.no_plot:
+		plot_points(pointsU, pointsV)
 
 	# Calculate distances and save to file
-	with open(args.path, "w") as f:
-		f.write(f"{args.n}\n")
-
-		for i in range(len(pointsU[0])):
-			u = (pointsU[0][i], pointsU[1][i])
-			weights = []
-
-			for j in range(len(pointsV[0])):
-				v = (pointsV[0][j], pointsV[1][j])
-				w = get_distance(u, v)
-				weights.append(round(w, 2))
-			
-			# Saves weights to file
-			line = " ".join(map(str, weights))
-			f.write(f"{line}\n")
+	weight_blocks = generate_weight_blocks(pointsU, pointsV)
+	if args.format == "npy":
+		save_binary(args.path, args.n, weight_blocks)
+	else:
+		save_text(args.path, args.n, weight_blocks)
 
 	print(f"{Fore.GREEN}Results saved in {args.path}{Fore.WHITE}")
-
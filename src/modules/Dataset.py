@@ -0,0 +1,194 @@
+import os
+import json
+import numpy as np
+from colorama import Fore
+from . import Instrumentation
+from .ProgressBar import ProgressBar
+from .MetricSpace import BLOCK_SIZE, is_synthetic, generate_synthetic_points, generate_weight_blocks
+
+## Helper functions for reading the datasets (weight matrices) from the file system
+
+CACHE_DIR = ".cache"		# Binary caches are stored in this folder next to each dataset
+
+
+## Reads an n x n weight matrix from a dataset file in a single pass
+## File format: first line is 'n', followed by n lines of n space-separated weights
+## Input: path to dataset 'file_path', progress bar toggle 'progress'
+## Output: weights[u][v] -> weight of edge between u(LHS) and v(RHS)
+def read_weights(file_path, progress=True):
+	n, rows = read_weight_rows(file_path)
+	weights = np.empty((n, n), dtype=float)
+
+	# Initialize progress bar (only drawn on a terminal)
+	progress_bar = ProgressBar(n, enabled=None if progress else False)
+	if progress_bar.enabled:
+		print("Processing file...")
+
+	for row, values in enumerate(rows):
+		weights[row] = values
+
+		# Progress bar
+		progress_bar.advance()
+
+	return weights
+
+
+## Reads the rows of a dataset file one at a time (only the header is read immediately)
+## Output: n, generator of rows (arrays of n weights)
+def read_weight_rows(file_path):
+	f = open(file_path, "r")
+	header = f.readline().strip()
+	try:
+		n = int(header)
+	except ValueError:
+		f.close()
+		raise Exception(f"{Fore.RED}{file_path}: invalid header '{header}' (expected n){Fore.WHITE}")
+
+	if n <= 0:
+		f.close()
+		raise Exception(f"{Fore.RED}{file_path}: n must be positive (got {n}){Fore.WHITE}")
+
+	return n, _iter_weight_rows(f, file_path, n)
+
+
+## Parses and validates the rows following the header of an open dataset file (closed when done)
+def _iter_weight_rows(f, file_path, n):
+	with f:
+		row = 0
+		for line_number, line in enumerate(f, start=2):
+			line = line.strip()
+			if not line:
+				# Ignores blank lines (i.e. trailing newlines)
+				continue
+
+			if row >= n:
+				raise Exception(f"{Fore.RED}{file_path}:{line_number}: more than n={n} rows found{Fore.WHITE}")
+
+			try:
+				values = np.array(line.split(), dtype=float)
+			except ValueError:
+				raise Exception(f"{Fore.RED}{file_path}:{line_number}: row contains a non-numeric weight{Fore.WHITE}")
+
+			if len(values) != n:
+				raise Exception(f"{Fore.RED}{file_path}:{line_number}: expected {n} weights, found {len(values)}{Fore.WHITE}")
+
+			yield values
+			row += 1
+
+	if row != n:
+		raise Exception(f"{Fore.RED}{file_path}: expected {n} rows, found {row}{Fore.WHITE}")
+
+
+## Iterates over the weights of a dataset in blocks of rows without loading the whole matrix
+## Input: text/binary dataset path or synthetic source spec 'source', maximum weights per block 'block_size'
+## Output: n, generator of (rows x n) weight blocks
+def iter_weight_blocks(source, block_size=BLOCK_SIZE):
+	if is_synthetic(source):
+		pointsU, pointsV = generate_synthetic_points(source)
+		return len(pointsU[0]), (block for _, block in generate_weight_blocks(pointsU, pointsV, block_size))
+
+	if source.endswith(".npy"):
+		weights = read_binary_weights(source)
+		rows = max(1, block_size // len(weights))
+		return len(weights), (weights[start:start + rows] for start in range(0, len(weights), rows))
+
+	n, rows = read_weight_rows(source)
+	return n, _group_rows(rows, n, max(1, block_size // n))
+
+
+## Groups rows of n weights in blocks of 'count' rows
+## Note: the same buffer is reused for every block
+def _group_rows(rows, n, count):
+	block = np.empty((count, n), dtype=float)
+	size = 0
+	for values in rows:
+		block[size] = values
+		size += 1
+		if size == count:
+			yield block
+			size = 0
+
+	if size:
+		yield block[:size]
+
+
+## Memory-maps an n x n weight matrix from a binary (.npy) dataset file
+def read_binary_weights(file_path):
+	weights = np.load(file_path, mmap_mode="r")
+	if weights.ndim != 2 or weights.shape[0] != weights.shape[1]:
+		raise Exception(f"{Fore.RED}{file_path}: expected an n x n matrix, found shape {weights.shape}{Fore.WHITE}")
+	return weights
+
+
+## Loads the weight matrix of a dataset, using a binary (.npy) cache when possible
+## The cache is invalidated whenever the size or modification time of the source file changes
+## Binary datasets (.npy, see metric_space_generator.py) are memory-mapped directly
+## Input: path to dataset 'file_path', cache toggle 'use_cache', force rewrite of cache 'rebuild'
+## Output: weights[u][v] (read-only memory-mapped array if loaded from the cache)
+def load_weights(file_path, use_cache=True, rebuild=False, progress=True):
+	if file_path.endswith(".npy"):
+		return read_binary_weights(file_path)
+
+	if not use_cache:
+		with Instrumentation.timer("parse"):
+			return read_weights(file_path, progress)
+
+	cache_path, meta_path = get_cache_paths(file_path)
+	source_meta = get_source_meta(file_path)
+
+	if not rebuild and is_cache_valid(cache_path, meta_path, source_meta):
+		with Instrumentation.timer("load_cache"):
+			return np.load(cache_path, mmap_mode="r")
+
+	with Instrumentation.timer("parse"):
+		weights = read_weights(file_path, progress)
+	with Instrumentation.timer("write_cache"):
+		write_cache(weights, cache_path, meta_path, source_meta)
+	return weights
+
+
+## Returns the paths of the cached matrix and its metadata
+## e.g. datasets/metric100.txt -> datasets/.cache/metric100.txt.npy, datasets/.cache/metric100.txt.json
+def get_cache_paths(file_path):
+	dir, file_name = os.path.split(os.path.abspath(file_path))
+	cache_base = os.path.join(dir, CACHE_DIR, file_name)
+	return f"{cache_base}.npy", f"{cache_base}.json"
+
+
+## Information about the source file used to invalidate its cache
+def get_source_meta(file_path):
+	stat = os.stat(file_path)
+	return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+## Checks if a cache exists and was generated from the current version of the source file
+def is_cache_valid(cache_path, meta_path, source_meta):
+	if not (os.path.isfile(cache_path) and os.path.isfile(meta_path)):
+		return False
+
+	try:
+		with open(meta_path, "r") as f:
+			cache_meta = json.load(f)
+	except (OSError, ValueError):
+		return False
+
+	return cache_meta == source_meta
+
+
+## Writes the cache atomically (temporary file + rename) so concurrent runs never read a partial file
+## A failure to write the cache is reported but does not stop the simulation
+def write_cache(weights, cache_path, meta_path, source_meta):
+	try:
+		os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+
+		temp_path = f"{cache_path}.{os.getpid()}.tmp"
+		with open(temp_path, "wb") as f:
+			np.save(f, np.ascontiguousarray(weights))
+		os.replace(temp_path, cache_path)
+
+		temp_path = f"{meta_path}.{os.getpid()}.tmp"
+		with open(temp_path, "w") as f:
+			json.dump(source_meta, f)
+		os.replace(temp_path, meta_path)
+	except OSError as e:
+		print(f"{Fore.YELLOW}Warning: could not write cache for {cache_path} ({e}){Fore.WHITE}")
@@ -0,0 +1,55 @@
+import numpy as np
+
+## Vectorized evaluation of many matchings at once (e.g. the whole (δ, ε, k) grid of a seed)
+## A matching is stored as a permutation array:
+##   LHS-indexed: permutation[u] -> RHS column matched to LHS node u
+##   RHS-indexed: permutation[v - n] -> LHS node matched to RHS node v
+## Note: sums are accumulated left to right (in index order) to reproduce the rounding of
+##       GraphAP.get_projected_matching_sum on the equivalent matching dictionary
+
+
+## Converts matched indices (from GraphAP.solve_assignment) to a permutation array
+## Input: matched indices 'row_ind', 'col_ind', partition size 'n', RHS toggle 'rhs'
+## Output: permutation array (-1 for unmatched nodes)
+def indices_to_permutation(row_ind, col_ind, n, rhs=False):
+	permutation = np.full(n, -1, dtype=int)
+	if rhs:
+		permutation[col_ind] = row_ind
+	else:
+		permutation[row_ind] = col_ind
+	return permutation
+
+
+## Gets the total weight of a stack of matchings
+## Input: weights[u][v], (S x n) permutation arrays 'permutations', RHS toggle 'rhs'
+## Output: array of S sums
+def get_matching_sums(weights, permutations, rhs=False):
+	permutations = np.atleast_2d(permutations)
+	indices = np.broadcast_to(np.arange(permutations.shape[1]), permutations.shape)
+
+	if rhs:
+		matched_weights = weights[permutations, indices]
+	else:
+		matched_weights = weights[indices, permutations]
+
+	return np.add.accumulate(matched_weights, axis=1)[:, -1]
+
+
+## Checks which matchings of a stack are perfect matchings (i.e. valid permutations)
+## Input: (S x n) permutation arrays 'permutations'
+## Output: array of S booleans
+def are_valid_matchings(permutations):
+	permutations = np.atleast_2d(permutations)
+	return (np.sort(permutations, axis=1) == np.arange(permutations.shape[1])).all(axis=1)
+
+
+## Gets the root mean squared deviation of a stack of weight matrices compared to 'weights'
+## Input: weights[u][v], (S x n x n) or (n x n) deviated weights 'deviated_weights'
+## Output: array of S RMSDs
+def get_rmsds(weights, deviated_weights):
+	deviated_weights = np.asarray(deviated_weights)
+	squared_deviations = (weights - deviated_weights.reshape(-1, *weights.shape)) ** 2
+	squared_deviations = squared_deviations.reshape(len(squared_deviations), -1)
+
+	summations = np.add.accumulate(squared_deviations, axis=1)[:, -1]
+	return np.sqrt(summations / weights.size)
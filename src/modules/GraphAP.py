@@ -1,132 +1,307 @@
+import os
 import math
+import functools
 import numpy as np
 import networkx as nx
 from networkx.algorithms import bipartite
-from .ProgressBar import ProgressBar
+from scipy.optimize import linear_sum_assignment
+from colorama import Fore
+from . import Instrumentation
+from .Dataset import load_weights
+from . import MetricSpace
+from . import OptimumCache
+from . import IncrementalAssignment
+
+SCAN_BLOCK_SIZE = 16		# First block of neighbours scanned by get_closest (doubled at every matched block)
 
 ## Graph for use in the Assignment Problem
 ## Has functions to aid in semi-online matching
 class GraphAP:
-	def __init__(self, file_path):
-		self._create_from_file(file_path)
+	def __init__(self, file_path=None, use_cache=True, rebuild_cache=False, weights=None, name=None):
+		if weights is None:
+			self._create_from_file(file_path, use_cache, rebuild_cache)
+		else:
+			self._create_from_weights(weights, name)
 
-		# Store optimal sum (using Karp's Algorithm)
-		karp_matching = GraphAP.get_optimal_matching(self.graph)
-		self.karp_sum = self.get_projected_matching_sum(karp_matching)
+		# Store optimal matching and sum (using Karp's Algorithm), read from the optimum cache when possible
+		# Note: the matching is reused by lookup tables with no unknown RHS nodes
+		optimum = GraphAP.get_optimum(self.weights, use_cache, rebuild_cache)
+		self.karp_indices = (optimum["row_ind"], optimum["col_ind"])
+		self.karp_sum = optimum["karp_sum"]
+		self.weight_min = optimum["min"]
+		self.weight_max = optimum["max"]
+		self.karp_duals = None		# Dual potentials of the optimum (only known when read from or written to the cache)
+		if optimum.get("row_duals") is not None:
+			self.karp_duals = (optimum["row_duals"], optimum["col_duals"])
 
 
-	## Initializes graph variables from a file
-	## Input: relative path 'rel_path'
-	def _create_from_file(self, file_path):
-		# Open the file
-		f = open(file_path)
+	## Builds a graph from a weight matrix held in memory (no dataset file is read)
+	## Input: weights[u][v] -> weight of edge between u(LHS) and v(RHS), instance 'name' (used in the results),
+	##        optimum cache toggles 'use_cache' and 'rebuild_cache'
+	@classmethod
+	def from_matrix(cls, weights, name="matrix", use_cache=True, rebuild_cache=False):
+		return cls(use_cache=use_cache, rebuild_cache=rebuild_cache, weights=weights, name=name)
+
+
+	## Builds a graph whose weights are the (rounded) distances between 2 sets of (x, y)-points
+	## Input: points (x array, y array) of the LHS 'pointsU' and RHS 'pointsV', instance 'name', optimum cache toggles
+	@classmethod
+	def from_points(cls, pointsU, pointsV, name="points", use_cache=True, rebuild_cache=False):
+		with Instrumentation.timer("generate"):
+			weights = MetricSpace.get_weight_matrix(pointsU, pointsV)
+		return cls.from_matrix(weights, name, use_cache, rebuild_cache)
+
 
+	## Builds the graph of a synthetic source spec (e.g. 'synthetic:n=5000,seed=7', see MetricSpace.py)
+	## Input: source 'spec', optimum cache toggles 'use_cache' and 'rebuild_cache'
+	@classmethod
+	def from_synthetic(cls, spec, use_cache=True, rebuild_cache=False):
+		return cls.from_points(*MetricSpace.generate_synthetic_points(spec), spec, use_cache, rebuild_cache)
+
+
+	## Initializes graph variables from a file
+	## Input: relative path 'rel_path', binary cache toggles 'use_cache' and 'rebuild_cache'
+	def _create_from_file(self, file_path, use_cache=True, rebuild_cache=False):
 		# Group the raw weights in a 2D array
 		# weights[u][v] -> weight of edge between u(LHS) and v(RHS)
-		n = int(f.readline())
-		weights = np.array([]).astype(float)
+		weights = load_weights(file_path, use_cache, rebuild_cache)
+		self._create_from_weights(weights, os.path.basename(file_path))
+
+
+	## Initializes graph variables from a weight matrix
+	## Input: weights[u][v] -> weight of edge between u(LHS) and v(RHS), instance 'name'
+	def _create_from_weights(self, weights, name):
+		n = len(weights)
+		if np.shape(weights) != (n, n):
+			raise Exception(f"{Fore.RED}{name}: expected an n x n weight matrix, found shape {np.shape(weights)}{Fore.WHITE}")
 
-		# Initialize progress bar
-		print("Processing file...")
-		with open(file_path, "rb") as f_temp:
-			progress_total = sum([1 for _ in f_temp]) - 1
-		line_count = 0
-		progress_bar = ProgressBar(progress_total) 
-		progress_bar.update_and_display(0)
+		# Assign class variables
+		# Nodes 0..n-1 are the LHS, nodes n..2n-1 are the RHS (i.e. node v -> column v - n)
+		self.n = n
+		self.name = name
+		self.weights = np.ascontiguousarray(weights, dtype=float)
+		self.matched = np.zeros(2 * n, dtype=bool)
+		with Instrumentation.timer("sort_edges"):
+			self.sorted_edges, self.group_ends = GraphAP.sort_edges(self.weights)
+		self.cursors = np.zeros(2 * n, dtype=int)
+		self._graph = None
+		self._incremental_assignment = None
+
+
+	## STATIC FUNCTION: Solves the full assignment problem, or reads its solution from the persistent cache
+	## (see OptimumCache.py). Needs no graph, so the cache can be filled without sorting the edges
+	## Input: weights[u][v] -> weight of edge between u(LHS) and v(RHS), cache toggle 'use_cache',
+	##        force re-solving (and rewriting the entry) 'rebuild_cache'
+	## Output: dictionary of OptimumCache.OPTIMUM_FIELDS
+	def get_optimum(weights, use_cache=True, rebuild_cache=False):
+		weights = np.ascontiguousarray(weights, dtype=float)
+		if use_cache:
+			key = OptimumCache.get_key(weights)
+			if not rebuild_cache:
+				with Instrumentation.timer("load_optimum"):
+					optimum = OptimumCache.load_optimum(key)
+				if optimum is not None:
+					return optimum
+
+		with Instrumentation.timer("karp"):
+			row_ind, col_ind, karp_sum = GraphAP.solve_assignment(weights)
+		optimum = {"row_ind": row_ind, "col_ind": col_ind, "karp_sum": karp_sum,
+			"min": weights.min(initial=np.inf), "max": weights.max(initial=-np.inf)}
+
+		if use_cache:
+			# Solved once per matrix, so the warm start of every later run reads them instead of recomputing them
+			duals = IncrementalAssignment.IncrementalAssignment.get_optimum_duals(weights, row_ind, col_ind)
+			optimum["row_duals"], optimum["col_duals"] = duals if duals is not None else (None, None)
+			with Instrumentation.timer("write_optimum"):
+				OptimumCache.write_optimum(key, optimum)
+		return optimum
+
+
+	## STATIC FUNCTION: Sorts the neighbours of every node by edge weight
+	## Input: weights[u][v] -> weight of edge between u(LHS) and v(RHS)
+	## Output: sorted_edges[i] -> neighbours of node i sorted by weight (ties in ascending node order),
+	##         group_ends[i][p] -> end position of the equal-weight group containing sorted_edges[i][p]
+	def sort_edges(weights):
+		n = len(weights)
+		
+		# Rows 0..n-1 are the LHS nodes, rows n..2n-1 are the RHS nodes
+		node_weights = np.concatenate((weights, weights.T))
+		sorted_indices = np.argsort(node_weights, axis=1, kind="stable")
+		sorted_weights = np.take_along_axis(node_weights, sorted_indices, axis=1)
 
-		for line in f:
-			weights = np.append(weights, list(map(float, line.strip().split(" "))))
-			
-			# Progress bar
-			line_count += 1
-			progress_bar.update_and_display(line_count)
+		sorted_edges = sorted_indices.astype(np.int32)
+		sorted_edges[:n] += n
 
-		weights = np.array(weights).reshape(n, n) 
+		# A group ends where the next weight differs (or at the end of the row)
+		positions = np.arange(1, n + 1, dtype=np.int32)
+		is_end = np.ones((2 * n, n), dtype=bool)
+		is_end[:, :-1] = sorted_weights[:, 1:] != sorted_weights[:, :-1]
+		ends = np.where(is_end, positions, n)
+		group_ends = np.minimum.accumulate(ends[:, ::-1], axis=1)[:, ::-1]
 
-		f.close()
+		return sorted_edges, np.ascontiguousarray(group_ends, dtype=np.int32)
 
-		# Create NetworkX Graph and the sorted_edges
-		graph = nx.Graph()
-		sorted_edges = np.empty(2 * n, dtype=dict)
-		for i in range(2 * n):
-			sorted_edges[i] = {}
 
+	## NetworkX view of the graph, only built when requested
+	## Note: the node attribute "matched" is synced with self.matched on every access
+	@property
+	def graph(self):
+		if self._graph is None:
+			self._graph = GraphAP.build_graph(self.weights)
+
+		nx.set_node_attributes(self._graph, dict(enumerate(self.matched.tolist())), "matched")
+		return self._graph
+
+
+	## STATIC FUNCTION: Builds a complete bipartite NetworkX graph from a weight matrix
+	## Input: weights[u][v] -> weight of edge between u(LHS) and v(RHS)
+	## Output: nx.Graph with LHS nodes 0..n-1 and RHS nodes n..2n-1
+	def build_graph(weights):
+		n = len(weights)
+		graph = nx.Graph()
 		graph.add_nodes_from(list(range(n)), bipartite=0, matched=False)
 		graph.add_nodes_from(list(range(n, n * 2)), bipartite=1, matched=False)
-		
-		# Initialize progress bar
-		print("Building graph...")
-		progress_total = n * n
-		progress_bar = ProgressBar(progress_total) 
-		progress_bar.update_and_display(0)
-
-		for u in range(n):
-			for v in range(n, 2 * n):
-				# Adds edge to Graph
-				w = weights[u][v - n]
-				graph.add_edge(u, v, weight=w)
-				
-				# Initialize sorted_edges array if necessary
-				if not w in sorted_edges[u]:
-					sorted_edges[u][w] = []
-				if not w in sorted_edges[v]:
-					sorted_edges[v][w] = []
-				
-				# Adds connected node to sorted_edges
-				sorted_edges[u][w].append(v)
-				sorted_edges[v][w].append(u)
-
-				# Progress bar
-				progress_bar.update_and_display(u * n + (v - n) + 1)
-
-
-		# Sorts the items of sorted_edges
-		for i in range(2 * n):
-			sorted_edges[i] = dict(sorted(sorted_edges[i].items()))
 
-		# Assign class variables
-		self.n = n
-		self.graph = graph
-		self.sorted_edges = sorted_edges
+		u, v = np.indices((n, n)).reshape(2, -1)
+		graph.add_weighted_edges_from(zip(u.tolist(), (v + n).tolist(), weights.ravel()))
+		return graph
+
+
+	## STATIC FUNCTION: Extracts the weight matrix from a complete bipartite NetworkX graph
+	## Output: weights[u][v] -> weight of edge between u(LHS) and v + n(RHS)
+	def get_weight_matrix(graph):
+		n = graph.number_of_nodes() // 2
+		matrix = bipartite.biadjacency_matrix(graph, row_order=list(range(n)), 
+			column_order=list(range(n, 2 * n)), dtype=float)
+		return matrix.toarray()
 
 
 	## Validator to check if all the nodes have a match
 	## Output: bool
 	def is_matched_completely(self):
-		for i in range(2 * self.n):
-			is_matched = self.graph.nodes[i]["matched"]
-			if not is_matched:
-				return False
-		return True
+		return bool(self.matched.all())
 
 
 	## Creates a lookup table from the first 1 - δ % of RHS nodes
-	## Input: proportion of unknown 'delta': range(0.0-1.0), RHS toggle 'rhs'
+	## Input: proportion of unknown 'delta': range(0.0-1.0), RHS toggle 'rhs', random generator 'rng'
 	## Output: one-way matching dictionary with RHS nodes as keys by default
-	def generate_lookup_table(self, delta, rhs=True):
-		# Creates a reduced subgraph
+	def generate_lookup_table(self, delta, rhs=True, rng=np.random):
+		with Instrumentation.timer("lookup"):
+			row_ind, col_ind = self._solve_known_subproblem(delta, rng)
+		return GraphAP.indices_to_matching(row_ind, col_ind, self.n, rhs)
+
+
+	## Array form of generate_lookup_table
+	## Input: proportion of unknown 'delta': range(0.0-1.0), random generator 'rng'
+	## Output: lookup[v - n] -> LHS node reserved for RHS node v (-1 if v is unknown)
+	def generate_lookup_array(self, delta, rng=np.random):
+		with Instrumentation.timer("lookup"):
+			row_ind, col_ind = self._solve_known_subproblem(delta, rng)
+		lookup = np.full(self.n, -1, dtype=int)
+		lookup[col_ind] = row_ind
+		return lookup
+
+
+	## Randomly culls δ % of the RHS nodes and optimally matches the remaining (known) RHS nodes
+	## The known RHS nodes are selected as columns of self.weights (no graph is copied)
+	## Output: matched indices 'row_ind' (LHS), 'col_ind' (RHS column, i.e. v - n)
+	def _solve_known_subproblem(self, delta, rng=np.random):
 		cull_count = math.floor(delta * self.n)
 
 		if cull_count == self.n:
 			# Returns an empty lookup table if all nodes are unknown
-			return {}
+			return np.empty(0, dtype=int), np.empty(0, dtype=int)
 
 		# cull_indices = list(range(2 * self.n - cull_count, 2 * self.n))	<-- Alternative: Culls the last x nodes 
-		cull_indices = np.random.choice(range(self.n, 2 * self.n), cull_count, replace=False)
+		cull_indices = rng.choice(range(self.n, 2 * self.n), cull_count, replace=False)
+
+		if cull_count == 0:
+			# The subproblem is the full problem, which was already solved in __init__
+			return self.karp_indices
+
+		known = np.ones(self.n, dtype=bool)
+		known[cull_indices - self.n] = False
+		cols = np.flatnonzero(known)
+
+		if IncrementalAssignment.ENABLED:
+			# Repairs the optimum of the full problem (falls back to a cold solve if it may differ from it)
+			with Instrumentation.timer("warm_start"):
+				solution = self.get_incremental_assignment().solve_columns(cols)
+			if solution is not None:
+				return solution
+
+		row_ind, col_ind, _ = GraphAP.solve_assignment(self.weights, cols=cols)
+		return row_ind, col_ind
 
-		subgraph = self.graph.copy()
-		subgraph.remove_nodes_from(cull_indices)
 
-		return GraphAP.get_optimal_matching(subgraph, rhs)
+	## Warm start engine of the lookup subproblems, built from the optimum of the full problem on first use
+	## (and from its cached dual potentials when available)
+	def get_incremental_assignment(self):
+		if self._incremental_assignment is None:
+			self._incremental_assignment = IncrementalAssignment.IncrementalAssignment(self.weights, *self.karp_indices,
+				self.karp_duals)
+		return self._incremental_assignment
 
 
 	## STATIC FUNCTION: Returns an optimal offline matching using Karp algorithm
+	## Input: NetworkX graph or weight matrix 'graph', RHS toggle 'rhs'
 	## Output: one-way matching dictionary (RHS keys)
 	def get_optimal_matching(graph, rhs=True):
+		if not isinstance(graph, nx.Graph):
+			# Dense weight matrix: skips the graph -> sparse -> dict conversion
+			row_ind, col_ind, _ = GraphAP.solve_assignment(graph)
+			return GraphAP.indices_to_matching(row_ind, col_ind, len(graph), rhs)
+
 		matching = bipartite.minimum_weight_full_matching(graph)
 		return GraphAP.convert_to_oneway_matching(matching, rhs)
 
 
+	## STATIC FUNCTION: Solves the assignment problem directly on a weight matrix
+	## Input: weights[u][v], optional subset of LHS 'rows' and RHS 'cols' (sorted indices of weights)
+	## Output: matched indices 'row_ind', 'col_ind' (ordered by row) and the total weight
+	def solve_assignment(weights, rows=None, cols=None):
+		weights = np.asarray(weights)
+		n, m = weights.shape
+		rows = np.arange(n) if rows is None else np.asarray(rows)
+		cols = GraphAP.get_column_order(np.arange(m) if cols is None else np.asarray(cols), n)
+
+		if len(rows) == n and np.array_equal(cols, np.arange(m)):
+			sub_weights = weights
+		else:
+			sub_weights = weights[np.ix_(rows, cols)]
+
+		row_ind, col_ind = linear_sum_assignment(sub_weights)
+
+		# Maps the subproblem's indices back to the indices of 'weights'
+		row_ind = rows[row_ind]
+		col_ind = cols[col_ind]
+
+		return row_ind, col_ind, sequential_sum(weights[row_ind, col_ind])
+
+
+	## STATIC FUNCTION: Orders the RHS columns the same way NetworkX does
+	## minimum_weight_full_matching orders the RHS by iterating over a set of the node indices (inserted in
+	## ascending order), which affects how ties between optimal matchings are broken.
+	## The order is derived by get_hash_set_order, so it does not depend on the interpreter running the simulation
+	## Input: sorted column indices 'cols', partition size 'n'
+	## Output: reordered column indices
+	def get_column_order(cols, n):
+		nodes = get_hash_set_order(tuple((cols + n).tolist()))
+		return np.array(nodes, dtype=int) - n
+
+
+	## STATIC FUNCTION: Converts matched indices (from solve_assignment) to a one-way matching
+	## Input: matched indices 'row_ind' and 'col_ind', partition size 'n', RHS toggle 'rhs'
+	## Output: one-way matching dictionary (RHS keys by default)
+	def indices_to_matching(row_ind, col_ind, n, rhs=True):
+		lhs_nodes = np.asarray(row_ind).tolist()
+		rhs_nodes = (np.asarray(col_ind) + n).tolist()
+
+		if rhs:
+			return dict(zip(rhs_nodes, lhs_nodes))
+		return dict(zip(lhs_nodes, rhs_nodes))
+
+
 	## STATIC FUNCTION: Halves the size of a two-way matching
 	## Input: bloated matching 'matching', RHS toggle 'rhs'
 	## Ouptut one-way matching
@@ -151,42 +326,115 @@ class GraphAP:
 		else:
 			true_matching = list(matching.items())
 
-		weights = [self.graph.edges[u, v]["weight"] for u, v in true_matching]
-		return sum(weights)
+		if not true_matching:
+			return 0
+
+		# Either side of a pair may be the LHS node
+		a, b = np.array(true_matching, dtype=int).T
+		u = np.minimum(a, b)
+		v = np.maximum(a, b) - self.n
+		return sequential_sum(self.weights[u, v])
 
 
 	## Resets the graph's attributes to allow reuse
 	def flush(self):
 		# Sets all nodes to unmatched
-		for i in range(2 * self.n):
-			self.graph.nodes[i]["matched"] = False
+		self.matched[:] = False
+		self.cursors[:] = 0
 
 	
 	## Sets the nodes of an edge to matched
 	def set_matched(self, u, v):
-		self.graph.nodes[u]["matched"] = True
-		self.graph.nodes[v]["matched"] = True
+		self.matched[u] = True
+		self.matched[v] = True
 		
 	
 	## Randomly chooses the closest unmatched node (Works for both LHS and RHS)
-	## Input: node index 'i'
-	## Output: matched node index
-	def get_closest(self, i):
-		edges = self.sorted_edges[i]
-
-		for w in edges.keys():
-			# Scans for closest unmatched nodes
-			unmatched = edges[w].copy()
-			
-			for j in range(len(unmatched)-1, -1, -1):
-				node_index = unmatched[j]
-				if self.graph.nodes[node_index]["matched"]:
-					unmatched.remove(node_index)
-
-			# Chooses randomly from the unmatched nodes
-			if unmatched:
-				choice = np.random.choice(unmatched)
-				return choice
-
-		print(f"Error: match for node {i} not found!")
-		
\ No newline at end of file
+	## Each node keeps a cursor into its sorted neighbours; matched neighbours before the cursor
+	## are skipped for good (lazy deletion), since nodes are only unmatched again by flush()
+	## The cursor moves past every matched neighbour scanned, so all queries of a node cost O(n) in total
+	## Input: node index 'i', random generator 'rng', optional pre-drawn uniform number in [0, 1) 'draw'
+	## Output: matched node index (raises if every neighbour is matched)
+	def get_closest(self, i, rng=np.random, draw=None):
+		neighbours = self.sorted_edges[i]
+		first = self.cursors[i]
+
+		# Scans for the closest unmatched node in blocks of doubling size, so a query costs O(skipped entries)
+		# and the cursor stays past them (amortized O(1) per matched neighbour)
+		block = SCAN_BLOCK_SIZE
+		while first < len(neighbours):
+			unmatched = ~self.matched[neighbours[first:first + block]]
+			if unmatched.any():
+				first += int(unmatched.argmax())
+				break
+			first = min(first + block, len(neighbours))
+			block *= 2
+		self.cursors[i] = first
+
+		if first == len(neighbours):
+			raise Exception(f"{Fore.RED}Error: match for node {i} not found!{Fore.WHITE}")
+
+		# Chooses randomly from the unmatched nodes with the same weight
+		candidates = neighbours[first:self.group_ends[i][first]]
+		candidates = candidates[~self.matched[candidates]]
+		if draw is not None:
+			return candidates[int(draw * len(candidates))]
+		return rng.choice(candidates)
+
+
+SET_MIN_SIZE = 8		# Hash table parameters of the CPython (3.6+) set that get_hash_set_order reproduces
+SET_LINEAR_PROBES = 9
+SET_PERTURB_SHIFT = 5
+
+
+## Iteration order of a hash set of non-negative integer keys (hash(key) == key) after inserting them in order
+## Reproduces the open addressing (linear probes, then perturbed jumps) and resizing of CPython's set,
+## which is the order NetworkX used to break ties between optimal matchings in the published results
+## Input: tuple of distinct keys 'keys' in insertion order
+## Output: list of the keys in iteration order
+@functools.lru_cache(maxsize=128)
+def get_hash_set_order(keys):
+	table = [None] * SET_MIN_SIZE
+	used = 0
+	for key in keys:
+		insert_hash_key(table, key)
+		used += 1
+
+		# Grows the table once it is 3/5 full (keys are reinserted in table order)
+		if used * 5 >= (len(table) - 1) * 3:
+			size = SET_MIN_SIZE
+			while size <= (used * 2 if used > 50000 else used * 4):
+				size <<= 1
+			old_keys = [k for k in table if k is not None]
+			table = [None] * size
+			for k in old_keys:
+				insert_hash_key(table, k)
+
+	return [key for key in table if key is not None]
+
+
+## Inserts a key in the first free slot of its probe sequence (see get_hash_set_order)
+def insert_hash_key(table, key):
+	mask = len(table) - 1
+	perturb = key
+	i = key & mask
+	while True:
+		if table[i] is None:
+			table[i] = key
+			return
+		if i + SET_LINEAR_PROBES <= mask:
+			for j in range(i + 1, i + SET_LINEAR_PROBES + 1):
+				if table[j] is None:
+					table[j] = key
+					return
+		perturb >>= SET_PERTURB_SHIFT
+		i = (i * 5 + 1 + perturb) & mask
+
+
+## Adds the values one at a time from left to right
+## Note: unlike np.sum (pairwise summation), this reproduces the rounding of a plain Python loop
+def sequential_sum(values):
+	values = np.asarray(values, dtype=float).ravel()
+	if len(values) == 0:
+		return 0
+	return np.add.accumulate(values)[-1]
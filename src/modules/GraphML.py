@@ -3,64 +3,71 @@ import numpy as np
 import networkx as nx
 from colorama import Fore
 from .GraphAP import GraphAP
+from .Evaluation import get_rmsds
+from . import Kernels
 
 ## Kasilag's version of the Online AP with ML Advice
 class GraphML(GraphAP):
-	def __init__(self, file_path):
-		super().__init__(file_path)
+	def __init__(self, file_path=None, use_cache=True, rebuild_cache=False, weights=None, name=None):
+		super().__init__(file_path, use_cache, rebuild_cache, weights, name)
 
-		## Gets the minimum and maximum edge weights from the graph
-		max = 1
-		min = 100
-
-		for u in range(self.n):
-			for v in range(self.n, 2 * self.n):
-				weight = self.graph.edges[u, v]["weight"]
-				if weight > max:
-					max = weight
-				if weight < min:
-					min = weight
-
-		self.max = max
-		self.min = min
+		## Gets the minimum and maximum edge weights from the graph (computed with the optimum, see GraphAP)
+		## Note: max is at least 1 and min is at most 100
+		self.max = np.maximum(self.weight_max, 1)
+		self.min = np.minimum(self.weight_min, 100)
 
 
 	## Uses a modified perturbation method (Kasilag et al, 2022) to get a predicted matching
-	## Input: proportion of unknown 'delta': range(0.0-1.0), proportion of perturbed 'epsilon': range(0.0-1.0), perturb amount 'k'
+	## Input: proportion of unknown 'delta': range(0.0-1.0), proportion of perturbed 'epsilon': range(0.0-1.0), perturb amount 'k',
+	##        random generator 'rng' (np.random or numpy.random.Generator)
 	## Output: copy of self.graph with modified edge weights
-	def generate_perturbed_graph(self, delta, epsilon, k):
+	def generate_perturbed_graph(self, delta, epsilon, k, rng=np.random):
+		return GraphAP.build_graph(self.generate_perturbed_weights(delta, epsilon, k, rng=rng))
+
+
+	## Same as generate_perturbed_graph but without building a NetworkX graph
+	## Consumes the random stream exactly like the original edge-by-edge implementation
+	## Input: same as generate_perturbed_graph, optional (n x n) buffer 'out' to write the weights into
+	## Output: copy of self.weights with modified edge weights
+	def generate_perturbed_weights(self, delta, epsilon, k, out=None, rng=np.random):
 		# Get elements to perturb
 		RHS_count = math.floor(delta * self.n)												
-		RHS_candidates = np.random.choice(range(self.n, 2 * self.n), RHS_count, replace=False)
-
-		# Generate perturbation candidates
-		perturb_candidates = []
-		for u in range(self.n):
-			for v in RHS_candidates:
-				edge_index = u * self.n + (v - self.n)
-				perturb_candidates.append(edge_index)
+		RHS_candidates = rng.choice(range(self.n, 2 * self.n), RHS_count, replace=False)
+
+		# Generate perturbation candidates (edge indices, ordered by u then by RHS_candidates)
+		perturb_candidates = (np.arange(self.n) * self.n)[:, None] + (RHS_candidates - self.n)[None, :]
+		perturb_candidates = perturb_candidates.ravel()
 		
 		# Get elements to perturb
 		perturb_count = math.floor(epsilon * len(perturb_candidates))
-		perturb_indices = np.random.choice(perturb_candidates, perturb_count, replace=False)
+		perturb_indices = rng.choice(perturb_candidates, perturb_count, replace=False)
 		
-		# Perturbation
-		subgraph = self.graph.copy()
-		for i in perturb_indices:
-			u, v = self.edge2nodes(i)
-			weight = subgraph.edges[u, v]["weight"]
-
-			if weight - k < self.min:
-				perturbation = k
-			elif weight + k > self.max:
-				perturbation = -k
-			else:
-				if np.random.choice([True, False]):
-					perturbation = k
-				else:
-					perturbation = -k
-			subgraph.edges[u, v]["weight"] += perturbation
-		return subgraph
+		# Perturbation: +k near the minimum, -k near the maximum, random direction otherwise
+		if out is None:
+			weights = self.weights.copy()
+		else:
+			weights = out
+			np.copyto(weights, self.weights)
+
+		if Kernels.ENABLED:
+			# Same classification and coin flips as below, as compiled loops over the perturbed edges
+			flat_weights = weights.reshape(-1)
+			directions = Kernels.classify_edges(flat_weights, perturb_indices, k, self.min, self.max)
+			flips = rng.choice([True, False], size=int((directions == 0).sum()))
+			Kernels.perturb_edges(flat_weights, perturb_indices, directions, flips, k)
+			return weights
+
+		edge_weights = weights.flat[perturb_indices]
+		is_low = edge_weights - k < self.min
+		is_high = ~is_low & (edge_weights + k > self.max)
+		is_free = ~(is_low | is_high)
+
+		# One coin flip per free edge, in the same order as the edge-by-edge version
+		is_positive = is_low.copy()
+		is_positive[is_free] = rng.choice([True, False], size=int(is_free.sum()))
+
+		weights.flat[perturb_indices] += np.where(is_positive, k, -k)
+		return weights
 
 
 	## Converts an edge index to it's corresponding u, v nodes
@@ -76,13 +83,12 @@ class GraphML(GraphAP):
 
 
 	## Gets the root mean squared deviation of a graph compared to self.graph
-	## Input: deviated graph
+	## Input: deviated graph (or its weight matrix)
 	## Output: RMSD
 	def calculate_rmsd(self, deviated_graph: nx.Graph):
-		summation = 0
-		for u in range(self.n):
-			for v in range(self.n, 2 * self.n):
-				deviation = self.graph.edges[u, v]["weight"] - deviated_graph.edges[u, v]["weight"]
-				summation += deviation ** 2
+		if isinstance(deviated_graph, nx.Graph):
+			deviated_weights = GraphAP.get_weight_matrix(deviated_graph)
+		else:
+			deviated_weights = np.asarray(deviated_graph)
 
-		return math.sqrt(summation / self.n ** 2)
\ No newline at end of file
+		return float(get_rmsds(self.weights, deviated_weights)[0])
\ No newline at end of file
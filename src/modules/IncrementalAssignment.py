@@ -0,0 +1,199 @@
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import connected_components
+from . import Instrumentation
+from . import Kernels
+from .MetricSpace import DECIMALS
+
+## Warm-started assignment of column subproblems (e.g. the known RHS nodes of a lookup table)
+## The optimum of the full problem and its dual potentials are kept, and the matching of a subproblem is repaired
+## with shortest augmenting paths from the rows whose column was removed, instead of being solved from scratch.
+## The repaired matching is only returned when it is provably the unique optimum (so a cold solve returns the
+## same matching); otherwise the caller falls back to a cold solve.
+## Works on integer costs (weights scaled by 10^DECIMALS), so that tight edges are detected exactly
+
+ENABLED = False		# Turned on by main.py --warm-start
+
+
+## Turns the warm start of the lookup subproblems on/off
+def enable(enabled=True):
+	global ENABLED
+	ENABLED = enabled
+
+
+class IncrementalAssignment:
+	## Input: weights[u][v], optimal matching of the full problem 'row_ind', 'col_ind',
+	##        its dual potentials (row_duals, col_duals) 'duals' (computed if None, see get_optimum_duals), cost 'scale'
+	def __init__(self, weights, row_ind, col_ind, duals=None, scale=10 ** DECIMALS):
+		self.n = len(weights)
+		self.costs = IncrementalAssignment.to_integer_costs(weights, scale)
+		self.col4row = np.full(self.n, -1, dtype=np.int64)
+		self.col4row[row_ind] = col_ind
+		self.row_duals = None
+		self.col_duals = None
+
+		if self.costs is not None and duals is not None:
+			self.row_duals, self.col_duals = duals
+		elif self.costs is not None:
+			with Instrumentation.timer("duals"):
+				self.row_duals, self.col_duals = IncrementalAssignment.get_dual_potentials(self.costs, self.col4row)
+
+
+	## STATIC FUNCTION: Dual potentials of the optimum of the full problem (stored in the optimum cache)
+	## Input: weights[u][v], optimal matching 'row_ind', 'col_ind', cost 'scale'
+	## Output: (row_duals, col_duals) of the integer costs, None if the weights cannot be scaled to integers
+	def get_optimum_duals(weights, row_ind, col_ind, scale=10 ** DECIMALS):
+		costs = IncrementalAssignment.to_integer_costs(weights, scale)
+		if costs is None:
+			return None
+
+		col4row = np.empty(len(costs), dtype=np.int64)
+		col4row[row_ind] = col_ind
+		with Instrumentation.timer("duals"):
+			return IncrementalAssignment.get_dual_potentials(costs, col4row)
+
+
+	## STATIC FUNCTION: Scales the weights to exact integer costs
+	## Output: int64 cost matrix (None if some weight has more than log10(scale) decimals)
+	def to_integer_costs(weights, scale):
+		costs = np.rint(np.asarray(weights) * scale)
+		if not np.array_equal(costs / scale, weights) or np.abs(costs).max(initial=0) >= 2 ** 40:
+			return None
+		return costs.astype(np.int64)
+
+
+	## STATIC FUNCTION: Dual potentials of an optimal matching of a square problem
+	## Column potentials are shortest distances in the exchange graph (column j -> j' costs
+	## costs[row of j][j'] - costs[row of j][j]), computed with vectorized Bellman-Ford
+	## Output: row potentials 'u', column potentials 'v' (u[i] + v[j] <= costs[i][j], tight on the matching)
+	def get_dual_potentials(costs, col4row):
+		n = len(costs)
+		row4col = np.empty(n, dtype=np.int64)
+		row4col[col4row] = np.arange(n)
+
+		exchanges = costs[row4col]
+		exchanges -= exchanges[np.arange(n), np.arange(n)][:, None]
+
+		v = np.zeros(n, dtype=np.int64)
+		while True:
+			relaxed = np.minimum(v, (v[:, None] + exchanges).min(axis=0))
+			if np.array_equal(relaxed, v):
+				break
+			v = relaxed
+
+		u = costs[np.arange(n), col4row] - v[col4row]
+		return u, v
+
+
+	## Solves the subproblem restricted to some columns (every column is matched, some rows stay unmatched)
+	## Input: sorted column indices 'cols'
+	## Output: matched indices 'row_ind', 'col_ind' (ordered by row), None if the optimum is not provably unique
+	def solve_columns(self, cols):
+		if self.costs is None:
+			return None
+
+		is_known = np.zeros(self.n, dtype=bool)
+		is_known[cols] = True
+
+		# Rectangular duals: row potentials <= 0 (0 for unmatched rows)
+		shift = self.row_duals.max()
+		u = self.row_duals - shift
+		v = self.col_duals + shift
+
+		col4row = self.col4row.copy()
+		row4col = np.full(self.n, -1, dtype=np.int64)
+		row4col[col4row] = np.arange(self.n)
+		freed = np.flatnonzero(~is_known[col4row])
+		col4row[freed] = -1
+		row4col[~is_known] = -1
+
+		if Kernels.ENABLED:
+			Kernels.repair_assignment(self.costs, u, v, col4row, row4col, is_known, freed)
+		else:
+			for row in freed:
+				self._repair_row(row, u, v, col4row, row4col, is_known)
+
+		if not self._is_unique(cols, u, v, col4row):
+			Instrumentation.count("warm_start_fallbacks")
+			return None
+
+		row_ind = np.flatnonzero(col4row >= 0)
+		return row_ind, col4row[row_ind]
+
+
+	## Restores the optimality of a freed row (Dijkstra from the row to a virtual sink reached from any row i at
+	## cost -u[i], i.e. by leaving row i unmatched), then updates the duals and augments along the shortest path
+	## Same steps as Kernels.repair_assignment, with each scan vectorized over the columns
+	def _repair_row(self, row, u, v, col4row, row4col, is_known):
+		if u[row] == 0:
+			return
+
+		infinity = np.iinfo(np.int64).max
+		distances = np.full(self.n, infinity, dtype=np.int64)
+		predecessors = np.full(self.n, -1, dtype=np.int64)
+		is_scanned = ~is_known
+		scanned_rows, row_distances = [row], [0]
+		sink_distance, sink_row = -u[row], row
+
+		i, distance = row, 0
+		while True:
+			candidates = distance + self.costs[i] - u[i] - v
+			is_shorter = (candidates < distances) & ~is_scanned
+			distances[is_shorter] = candidates[is_shorter]
+			predecessors[is_shorter] = i
+
+			pending = np.where(is_scanned, infinity, distances)
+			j = int(pending.argmin())
+			if pending[j] >= sink_distance:
+				break
+
+			is_scanned[j] = True
+			i, distance = row4col[j], distances[j]
+			scanned_rows.append(i)
+			row_distances.append(distance)
+			if distance - u[i] < sink_distance:
+				sink_distance, sink_row = distance - u[i], i
+
+		u[scanned_rows] += sink_distance - np.array(row_distances)
+		scanned_cols = is_scanned & is_known
+		v[scanned_cols] -= sink_distance - distances[scanned_cols]
+
+		if sink_row != row:
+			IncrementalAssignment.augment(row, sink_row, predecessors, col4row, row4col)
+
+
+	## STATIC FUNCTION: Shifts the rows along the path from 'row' to 'sink_row' (which becomes unmatched)
+	def augment(row, sink_row, predecessors, col4row, row4col):
+		j = col4row[sink_row]
+		col4row[sink_row] = -1
+		while True:
+			i = predecessors[j]
+			previous = col4row[i]
+			row4col[j] = i
+			col4row[i] = j
+			if i == row:
+				break
+			j = previous
+
+
+	## Checks that no other matching of the subproblem is optimal
+	## Every optimal matching only uses tight edges (complementary slackness), so another optimum exists iff the rows
+	## can be rotated along a cycle of tight edges: row i may move from its column (or from the pool of unmatched
+	## rows) to any tight column, and a row with a zero potential may leave its column for the pool
+	def _is_unique(self, cols, u, v, col4row):
+		m = len(cols)
+		nodes = np.full(self.n, m)		# Column -> graph node (m is the pool of unmatched rows)
+		nodes[cols] = np.arange(m)
+
+		rows, targets = np.nonzero(self.costs[:, cols] - u[:, None] - v[cols] == 0)
+		sources = nodes[np.maximum(col4row[rows], 0)]
+		sources[col4row[rows] < 0] = m
+		is_move = sources != targets
+
+		leaving = np.flatnonzero((col4row >= 0) & (u == 0))
+		sources = np.concatenate((sources[is_move], nodes[col4row[leaving]]))
+		targets = np.concatenate((targets[is_move], np.full(len(leaving), m)))
+
+		graph = csr_matrix((np.ones(len(sources)), (sources, targets)), shape=(m + 1, m + 1))
+		component_count, _ = connected_components(graph, directed=True, connection="strong")
+		return component_count == m + 1
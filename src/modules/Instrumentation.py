@@ -0,0 +1,190 @@
+import os
+import csv
+import json
+import time
+import tracemalloc
+
+## Lightweight timers and counters of the simulation phases (parsing, Karp solve, lookup table, greedy, ...)
+## Measurements are grouped in records labelled by their scope, e.g. (file, seed, δ, ε, k)
+## Disabled by default: timer/scope then return a shared no-op context manager and count returns immediately,
+## so the instrumentation can stay in the code of production sweeps
+
+ENABLED = False
+TRACK_MEMORY = False		# Also traces Python allocations with tracemalloc (slow)
+LABELS = ("file", "seed", "delta", "epsilon", "k")		# Report columns identifying a record
+
+
+## Measurements of a single scope
+class Record:
+	def __init__(self, labels):
+		self.labels = labels
+		self.phases = {}		# phase -> [calls, seconds]
+		self.counters = {}		# counter -> total
+		self.traced_peak = 0		# Peak of the traced Python allocations (bytes)
+		self.peak_rss = None		# Peak RSS of the process when the scope closed (MB, None while open)
+
+
+	def add_time(self, phase, seconds):
+		entry = self.phases.setdefault(phase, [0, 0.0])
+		entry[0] += 1
+		entry[1] += seconds
+
+
+	def is_empty(self):
+		return not (self.phases or self.counters)
+
+
+	## Output: JSON serializable dictionary
+	def to_dict(self):
+		return {
+			**{label: self.labels.get(label) for label in LABELS},
+			"phases": {phase: {"calls": calls, "seconds": seconds} for phase, (calls, seconds) in self.phases.items()},
+			"counters": dict(self.counters),
+			"peak_rss_mb": self.peak_rss,
+			"traced_peak_mb": self.traced_peak / 2 ** 20 if TRACK_MEMORY else None,
+		}
+
+
+## Context manager measuring the time spent in a phase
+class Timer:
+	def __init__(self, phase):
+		self.phase = phase
+
+
+	def __enter__(self):
+		self.start = time.perf_counter()
+		return self
+
+
+	def __exit__(self, *exc):
+		scopes[-1].add_time(self.phase, time.perf_counter() - self.start)
+		return False
+
+
+## Context manager grouping the measurements made inside it in a new record
+class Scope:
+	def __init__(self, labels):
+		self.labels = labels
+
+
+	def __enter__(self):
+		scopes.append(Record({**scopes[-1].labels, **self.labels}))
+		if TRACK_MEMORY:
+			tracemalloc.reset_peak()
+		return self
+
+
+	def __exit__(self, *exc):
+		record = scopes.pop()
+		record.peak_rss = get_peak_rss_mb()
+		if TRACK_MEMORY:
+			record.traced_peak = max(record.traced_peak, tracemalloc.get_traced_memory()[1])
+			scopes[-1].traced_peak = max(scopes[-1].traced_peak, record.traced_peak)
+		if not record.is_empty():
+			records.append(record)
+		return False
+
+
+## Context manager doing nothing (returned when the instrumentation is disabled)
+class NullContext:
+	def __enter__(self):
+		return self
+
+
+	def __exit__(self, *exc):
+		return False
+
+
+NULL_CONTEXT = NullContext()
+scopes = [Record({})]		# Stack of open scopes (the first one collects measurements made outside any scope)
+records = []		# Finished records
+
+
+## Turns the instrumentation on
+## Input: toggle for tracing the Python allocations 'track_memory'
+def enable(track_memory=False):
+	global ENABLED, TRACK_MEMORY
+	ENABLED = True
+	TRACK_MEMORY = track_memory
+	if track_memory and not tracemalloc.is_tracing():
+		tracemalloc.start()
+
+
+## Drops the open scopes and finished records, e.g. those a forked worker process inherits from its parent
+def reset():
+	scopes[:] = [Record({})]
+	records.clear()
+
+
+## Measures the time spent in a phase, e.g. 'with timer("karp"): ...'
+def timer(phase):
+	if not ENABLED:
+		return NULL_CONTEXT
+	return Timer(phase)
+
+
+## Groups the measurements of a block in a record labelled 'labels' (added to the labels of the enclosing scope)
+def scope(**labels):
+	if not ENABLED:
+		return NULL_CONTEXT
+	return Scope(labels)
+
+
+## Increments a counter of the current scope
+def count(counter, amount=1):
+	if not ENABLED:
+		return
+	counters = scopes[-1].counters
+	counters[counter] = counters.get(counter, 0) + amount
+
+
+## Returns the finished records as dictionaries and clears them (e.g. to send them from a worker process)
+def collect():
+	finished = records[:]
+	if not scopes[0].is_empty():
+		scopes[0].peak_rss = get_peak_rss_mb()		# The root scope never closes
+		finished.append(scopes[0])
+		scopes[0] = Record({})
+	records.clear()
+	return [record.to_dict() for record in finished]
+
+
+## Peak resident set size of this process (MB, None if unavailable)
+def get_peak_rss_mb():
+	try:
+		import resource
+	except ImportError:
+		return None
+
+	peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+	return peak / 2 ** 20 if os.uname().sysname == "Darwin" else peak / 2 ** 10		# bytes on macOS, KB on Linux
+
+
+## Sums the time of every phase over many records
+## Output: dictionary phase -> (calls, seconds) sorted by decreasing time
+def get_phase_totals(report):
+	totals = {}
+	for record in report:
+		for phase, entry in record["phases"].items():
+			calls, seconds = totals.get(phase, (0, 0.0))
+			totals[phase] = (calls + entry["calls"], seconds + entry["seconds"])
+	return dict(sorted(totals.items(), key=lambda item: -item[1][1]))
+
+
+## Writes the records in a JSON file, or in a CSV file (one row per record and phase) if 'file_path' ends with .csv
+def write_report(file_path, report):
+	if not file_path.endswith(".csv"):
+		with open(file_path, "w") as f:
+			json.dump(report, f, indent=1)
+		return
+
+	with open(file_path, "w", newline="") as f:
+		writer = csv.writer(f)
+		writer.writerow(LABELS + ("phase", "calls", "seconds", "peak_rss_mb", "traced_peak_mb"))
+		for record in report:
+			labels = tuple(record[label] for label in LABELS)
+			memory = (record["peak_rss_mb"], record["traced_peak_mb"])
+			for phase, entry in record["phases"].items():
+				writer.writerow(labels + (phase, entry["calls"], entry["seconds"]) + memory)
+			for counter, total in record["counters"].items():
+				writer.writerow(labels + (f"count:{counter}", total, None) + memory)
@@ -0,0 +1,200 @@
+import numpy as np
+
+## Optional compiled kernels of the sequential inner loops (greedy phase of semionline, edge perturbation,
+## warm-started assignment repairs)
+## The kernels are compiled with Numba when it is installed (compilations are cached on disk next to this file),
+## otherwise ENABLED is False and the callers keep their NumPy implementation.
+## Both versions consume the random stream in the same order, so the results are identical
+
+try:
+	import numba
+except ImportError:
+	numba = None
+
+JIT_AVAILABLE = numba is not None
+ENABLED = JIT_AVAILABLE
+
+
+## Compiles a kernel (returns it unchanged when Numba is not installed)
+def jit(function):
+	if numba is None:
+		return function
+	return numba.njit(cache=True)(function)
+
+
+## Turns the kernels on/off (they stay off when Numba is not installed)
+def enable(enabled=True):
+	global ENABLED
+	ENABLED = enabled and JIT_AVAILABLE
+
+
+## Marks the nodes of the lookup table as matched
+## Input: lookup[v - n] -> LHS node reserved for RHS node v (-1 if v is unknown), matched mask 'matched' (2n)
+@jit
+def reserve_lookup(lookup, matched):
+	n = len(lookup)
+	for column in range(n):
+		u = lookup[column]
+		if u >= 0:
+			matched[u] = True
+			matched[column + n] = True
+
+
+## Matches the arrivals of the RHS nodes starting from node 'start' + n (same steps as GraphAP.get_closest)
+## Stops at an arrival that needs the random generator, i.e. a tie without a pre-drawn number (empty 'draws'),
+## or that has no unmatched neighbour, so the caller can handle it in Python and resume after it
+## Output: column of the arrival that stopped the loop (n if every arrival was matched)
+@jit
+def greedy_arrivals(sorted_edges, group_ends, cursors, matched, lookup, matching, draws, start):
+	n = len(lookup)
+	for column in range(start, n):
+		v = column + n
+		if lookup[column] >= 0:
+			matching[column] = lookup[column]
+			continue
+
+		# Scans for the closest unmatched node
+		neighbours = sorted_edges[v]
+		first = cursors[v]
+		while first < n and matched[neighbours[first]]:
+			first += 1
+		if first == n:
+			return column
+		cursors[v] = first
+
+		# Counts the unmatched nodes with the same weight
+		end = group_ends[v][first]
+		count = 0
+		for p in range(first, end):
+			if not matched[neighbours[p]]:
+				count += 1
+
+		if count == 1:
+			choice = 0
+		elif len(draws) > 0:
+			choice = int(draws[column] * count)
+		else:
+			return column
+
+		# Selects the chosen unmatched node of the group
+		u = neighbours[first]
+		for p in range(first, end):
+			u = neighbours[p]
+			if not matched[u]:
+				if choice == 0:
+					break
+				choice -= 1
+
+		matching[column] = u
+		matched[u] = True
+		matched[v] = True
+	return n
+
+
+## Classifies the perturbed edges (same rules as GraphML.generate_perturbed_weights)
+## Output: directions[i] -> 1 (+k near the minimum), -1 (-k near the maximum) or 0 (random direction)
+@jit
+def classify_edges(weights, indices, k, min_weight, max_weight):
+	directions = np.zeros(len(indices), dtype=np.int8)
+	for i in range(len(indices)):
+		weight = weights[indices[i]]
+		if weight - k < min_weight:
+			directions[i] = 1
+		elif weight + k > max_weight:
+			directions[i] = -1
+	return directions
+
+
+## Perturbs the edges in place, using one coin flip per free edge (in order)
+## Input: flattened weights 'weights', edge 'indices', 'directions' (see classify_edges), 'flips' of the free edges
+@jit
+def perturb_edges(weights, indices, directions, flips, k):
+	f = 0
+	for i in range(len(indices)):
+		positive = directions[i] == 1
+		if directions[i] == 0:
+			positive = flips[f]
+			f += 1
+		if positive:
+			weights[indices[i]] += k
+		else:
+			weights[indices[i]] -= k
+
+
+## Restores the optimality of the freed rows of a column subproblem (see IncrementalAssignment._repair_row)
+## Input: integer 'costs', row/column potentials 'u'/'v', matching arrays 'col4row'/'row4col' (updated in place),
+##        known columns mask 'is_known', rows whose column was removed 'freed'
+@jit
+def repair_assignment(costs, u, v, col4row, row4col, is_known, freed):
+	n = len(u)
+	infinity = np.iinfo(np.int64).max
+	distances = np.empty(n, dtype=np.int64)
+	predecessors = np.empty(n, dtype=np.int64)
+	is_scanned = np.empty(n, dtype=np.bool_)
+	scanned_rows = np.empty(n + 1, dtype=np.int64)
+	row_distances = np.empty(n + 1, dtype=np.int64)
+	scanned_cols = np.empty(n, dtype=np.int64)
+
+	for row in freed:
+		if u[row] == 0:
+			continue
+
+		for j in range(n):
+			distances[j] = infinity
+			predecessors[j] = -1
+			is_scanned[j] = not is_known[j]
+		sink_distance = -u[row]
+		sink_row = row
+		scanned_rows[0] = row
+		row_distances[0] = 0
+		row_count = 1
+		col_count = 0
+
+		# Dijkstra from the freed row to the virtual sink (reached from row i at cost -u[i])
+		i = row
+		distance = 0
+		while True:
+			closest = -1
+			closest_distance = infinity
+			for j in range(n):
+				if is_scanned[j]:
+					continue
+				candidate = distance + costs[i, j] - u[i] - v[j]
+				if candidate < distances[j]:
+					distances[j] = candidate
+					predecessors[j] = i
+				if distances[j] < closest_distance:
+					closest_distance = distances[j]
+					closest = j
+			if closest < 0 or closest_distance >= sink_distance:
+				break
+
+			is_scanned[closest] = True
+			scanned_cols[col_count] = closest
+			col_count += 1
+			i = row4col[closest]
+			distance = closest_distance
+			scanned_rows[row_count] = i
+			row_distances[row_count] = distance
+			row_count += 1
+			if distance - u[i] < sink_distance:
+				sink_distance = distance - u[i]
+				sink_row = i
+
+		# Dual update, then augmentation along the shortest path
+		for k in range(row_count):
+			u[scanned_rows[k]] += sink_distance - row_distances[k]
+		for k in range(col_count):
+			v[scanned_cols[k]] -= sink_distance - distances[scanned_cols[k]]
+
+		if sink_row != row:
+			j = col4row[sink_row]
+			col4row[sink_row] = -1
+			while True:
+				i = predecessors[j]
+				previous = col4row[i]
+				row4col[j] = i
+				col4row[i] = j
+				if i == row:
+					break
+				j = previous
@@ -0,0 +1,102 @@
+import numpy as np
+from colorama import Fore
+
+## Helper functions for generating instances in R2 Euclidean space (see metric_space_generator.py)
+
+MAX_RADIUS = 50
+DECIMALS = 2		# Weights are rounded to this number of decimals
+BLOCK_SIZE = 2 ** 22		# Maximum number of weights computed at once
+SYNTHETIC_PREFIX = "synthetic:"		# Source spec of an in-memory instance, e.g. 'synthetic:n=5000,seed=7'
+
+
+## Generates a list of uniformly distributed set of points inside a circle
+def generate_points(max_radius, count, rng=np.random):
+	angle = rng.uniform(0, 2 * np.pi, count)
+	radius = (rng.uniform(size=count) ** 0.5) * max_radius
+
+	x = radius * np.cos(angle)
+	y = radius * np.sin(angle)
+
+	return (x, y)
+
+
+## Get distances between every pair of (x, y)-points of 2 sets
+## Input: points (x array, y array) 'pointsU' and 'pointsV'
+## Output: distances[i][j] -> distance between pointsU[i] and pointsV[j]
+def get_distances(pointsU, pointsV):
+	x_dist = pointsU[0][:, None] - pointsV[0][None, :]
+	y_dist = pointsU[1][:, None] - pointsV[1][None, :]
+
+	return np.sqrt(x_dist * x_dist + y_dist * y_dist)
+
+
+## Rounds weights exactly like Python's round (np.round may differ when a weight is within
+## floating point error of a tie, so these few weights are rounded by Python instead)
+def round_weights(weights, decimals=DECIMALS):
+	rounded = np.round(weights, decimals)
+
+	scaled = weights * 10 ** decimals
+	ties = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+	if ties.any():
+		rounded[ties] = [round(w, decimals) for w in weights[ties].tolist()]
+
+	return rounded
+
+
+## Generates the weights of an instance in blocks of rows
+## Output: generator of (index of first row, weights of the rows)
+def generate_weight_blocks(pointsU, pointsV, block_size=BLOCK_SIZE):
+	n = len(pointsU[0])
+	rows = max(1, block_size // len(pointsV[0]))
+
+	for start in range(0, n, rows):
+		block = (pointsU[0][start:start + rows], pointsU[1][start:start + rows])
+		yield start, round_weights(get_distances(block, pointsV))
+
+
+## Builds the weight matrix of an instance
+## Output: weights[u][v] -> rounded distance between pointsU[u] and pointsV[v]
+def get_weight_matrix(pointsU, pointsV):
+	weights = np.empty((len(pointsU[0]), len(pointsV[0])), dtype=float)
+	for start, block in generate_weight_blocks(pointsU, pointsV):
+		weights[start:start + len(block)] = block
+	return weights
+
+
+## Checks if an input is a synthetic source spec instead of a dataset path
+def is_synthetic(source):
+	return source.startswith(SYNTHETIC_PREFIX)
+
+
+## Parses a synthetic source spec
+## Input: 'synthetic:n=<n>[,seed=<seed>][,radius=<radius>]'
+## Output: dictionary with n, seed and radius
+def parse_synthetic_spec(spec):
+	params = {"n": None, "seed": 0, "radius": MAX_RADIUS}
+
+	for param in filter(None, spec[len(SYNTHETIC_PREFIX):].split(",")):
+		key, _, value = param.partition("=")
+		key = key.strip()
+		if key not in params:
+			raise Exception(f"{Fore.RED}{spec}: unknown parameter '{key}' (expected n, seed or radius){Fore.WHITE}")
+		try:
+			params[key] = float(value) if key == "radius" else int(value)
+		except ValueError:
+			raise Exception(f"{Fore.RED}{spec}: invalid value '{value}' for {key}{Fore.WHITE}")
+
+	if params["n"] is None or params["n"] <= 0:
+		raise Exception(f"{Fore.RED}{spec}: n must be a positive integer{Fore.WHITE}")
+
+	return params
+
+
+## Generates both sets of points of a synthetic source spec
+## The points are the same as 'metric_space_generator.py <n> <path> --seed <seed>'
+## Output: pointsU, pointsV
+def generate_synthetic_points(spec):
+	params = parse_synthetic_spec(spec)
+	rng = np.random.RandomState(params["seed"])
+
+	pointsU = generate_points(params["radius"], params["n"], rng)
+	pointsV = generate_points(params["radius"], params["n"], rng)
+	return pointsU, pointsV
@@ -0,0 +1,71 @@
+import os
+import hashlib
+import numpy as np
+import scipy
+from colorama import Fore
+
+## Persistent cache of the offline optimum of every weight matrix (optimal matching, its sum, the weight range and
+## the dual potentials of the matching, used by the warm start of modules/IncrementalAssignment.py)
+## Entries are content-addressed: the key is a hash of the weight matrix, so renamed/copied datasets and
+## synthetic instances share their entry and an edited dataset never reads a stale one.
+## The scipy version is part of the key, since another solver version may break ties between optima differently
+
+OPTIMUM_DIR = "../../datasets/.cache/optimum"		# Relative path (to this file)
+OPTIMUM_FIELDS = ("row_ind", "col_ind", "karp_sum", "min", "max", "row_duals", "col_duals")
+DUAL_FIELDS = ("row_duals", "col_duals")		# None if the weights have no exact integer scaling (stored empty)
+CACHE_VERSION = 2		# Increment when the stored fields change
+
+
+## Hashes a weight matrix (with its shape, dtype and the solver version)
+## Output: hexadecimal key of the matrix
+def get_key(weights):
+	weights = np.ascontiguousarray(weights, dtype=float)
+	digest = hashlib.sha1(f"{CACHE_VERSION}|{scipy.__version__}|{weights.shape}|{weights.dtype.str}|".encode())
+	digest.update(weights.data)
+	return digest.hexdigest()
+
+
+## Returns the path of the entry of a key, e.g. datasets/.cache/optimum/3f2a...npz
+def get_optimum_path(key):
+	dir = os.path.dirname(__file__)
+	return os.path.abspath(os.path.join(dir, OPTIMUM_DIR, f"{key}.npz"))
+
+
+## Reads the entry of a key
+## Output: dictionary of OPTIMUM_FIELDS (karp_sum, min and max as numpy scalars), None if missing or unreadable
+def load_optimum(key):
+	optimum_path = get_optimum_path(key)
+	if not os.path.isfile(optimum_path):
+		return None
+
+	try:
+		with np.load(optimum_path) as data:
+			optimum = {field: data[field] for field in OPTIMUM_FIELDS}
+	except (OSError, ValueError, KeyError):
+		return None
+
+	for field in ("karp_sum", "min", "max"):
+		optimum[field] = optimum[field][()]
+	for field in DUAL_FIELDS:
+		if optimum[field].size == 0:
+			optimum[field] = None
+	return optimum
+
+
+## Writes the entry of a key atomically (temporary file + rename) so concurrent runs never read a partial file
+## A failure to write the entry is reported but does not stop the simulation
+def write_optimum(key, optimum):
+	optimum_path = get_optimum_path(key)
+	try:
+		os.makedirs(os.path.dirname(optimum_path), exist_ok=True)
+
+		temp_path = f"{optimum_path}.{os.getpid()}.tmp"
+		with open(temp_path, "wb") as f:
+			fields = {field: optimum[field] for field in OPTIMUM_FIELDS}
+			for field in DUAL_FIELDS:
+				if fields[field] is None:
+					fields[field] = np.empty(0, dtype=np.int64)
+			np.savez(f, **fields)
+		os.replace(temp_path, optimum_path)
+	except OSError as e:
+		print(f"{Fore.YELLOW}Warning: could not write cache for {optimum_path} ({e}){Fore.WHITE}")
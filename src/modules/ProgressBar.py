@@ -1,32 +1,55 @@
+import sys
+import time
 import math
+import multiprocessing
 
 BAR_LENGTH = 64
+REFRESH_INTERVAL = 0.1		# Minimum number of seconds between redraws
 
 
+## Progress bar redrawn at most every REFRESH_INTERVAL seconds (with throughput and ETA)
+## Disabled automatically when the output is not a terminal (e.g. redirected to a log) or in a worker process
 class ProgressBar:
-	def __init__(self, total):
+	def __init__(self, total, unit="rows", enabled=None, interval=REFRESH_INTERVAL, file=None):
 		self.total = total
 		self.progress = 0
+		self.unit = unit
+		self.interval = interval
+		self.file = file or sys.stdout
+		self.enabled = is_interactive(self.file) if enabled is None else enabled
 
-	## Displays the progress bar if the new percentage has been incremented by at least 1
+		self.start_time = time.perf_counter()
+		self.display_time = -math.inf
+
+
+	## Displays the progress bar if at least REFRESH_INTERVAL seconds passed since the last redraw
+	## Callers should update it in coarse strides (e.g. once per row), never per edge
 	def update_and_display(self, new_progress):
-		old_percentage = self.get_percentage()
 		self.progress = new_progress
+		if not self.enabled:
+			return
 
-		if math.floor(self.get_percentage()) - math.floor(old_percentage) >= 1:
+		now = time.perf_counter()
+		if now - self.display_time >= self.interval or self.progress == self.total:
+			self.display_time = now
 			self.display()
 
 
+	## Increments the progress by 'step'
+	def advance(self, step=1):
+		self.update_and_display(self.progress + step)
+
+
 	def display(self):
 		bar = self.get_bar_text()
-		print(f"\r|{bar}| {self.get_percentage():.1f}%", end="\r")
+		print(f"\r|{bar}| {self.get_percentage():.1f}% | {self.get_rate_text()}", end="\r", file=self.file)
 		if self.progress == self.total:
-			print("")
+			print("", file=self.file)
 
 
 	## Input: Toggle between percentage and raw value 'percent'
 	def get_percentage(self, percent=True):
-		value = self.progress / self.total
+		value = self.progress / self.total if self.total else 1
 		if percent:
 			return 100 * value
 		return value
@@ -36,3 +59,35 @@ class ProgressBar:
 	def get_bar_text(self):
 		bar_count = int(self.get_percentage(percent=False) * BAR_LENGTH)
 		return chr(9608) * bar_count + chr(9617) * (BAR_LENGTH - bar_count)
+
+
+	## Gets the throughput and the estimated remaining time (elapsed time once done)
+	def get_rate_text(self):
+		elapsed = time.perf_counter() - self.start_time
+		rate = self.progress / elapsed if elapsed > 0 else 0
+
+		if self.progress >= self.total:
+			return f"{rate:.0f} {self.unit}/s | {format_duration(elapsed)}"
+		if rate == 0:
+			return f"0 {self.unit}/s | ETA --:--"
+		return f"{rate:.0f} {self.unit}/s | ETA {format_duration((self.total - self.progress) / rate)}"
+
+
+## Checks if progress bars can be drawn on 'file' (a terminal, outside of worker processes)
+def is_interactive(file):
+	if multiprocessing.parent_process() is not None:
+		return False
+
+	try:
+		return file.isatty()
+	except (AttributeError, ValueError):
+		return False
+
+
+## Formats a number of seconds as [h:]mm:ss
+def format_duration(seconds):
+	minutes, seconds = divmod(int(seconds), 60)
+	hours, minutes = divmod(minutes, 60)
+	if hours:
+		return f"{hours}:{minutes:02d}:{seconds:02d}"
+	return f"{minutes:02d}:{seconds:02d}"
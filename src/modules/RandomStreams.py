@@ -0,0 +1,27 @@
+import zlib
+import numpy as np
+
+## Helper functions for the random number generators used by the simulations
+
+PARAM_SCALE = 10 ** 6		# Float parameters (δ, ε) are scaled to integers before seeding
+
+
+## Creates an independent random generator for a single simulation cell
+## The stream only depends on its key, so results do not depend on the execution order or worker count
+## Input: base 'seed', dataset 'file_name', cell parameters 'params' (e.g. δ, ε, k)
+## Output: numpy.random.Generator
+def get_cell_rng(seed, file_name, *params):
+	key = [seed, zlib.crc32(file_name.encode())] + [round(p * PARAM_SCALE) for p in params]
+	return np.random.default_rng(np.random.SeedSequence(key))
+
+
+## Reseeds and returns the global (legacy) random state used by the published results
+## Output: the np.random module
+def get_legacy_rng(seed):
+	np.random.seed(seed)
+	return np.random
+
+
+## Checks if 'rng' draws from an independent stream (instead of the global random state)
+def is_generator(rng):
+	return isinstance(rng, np.random.Generator)
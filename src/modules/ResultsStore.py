@@ -0,0 +1,279 @@
+import os
+import sqlite3
+from datetime import datetime
+from colorama import Fore
+
+## Columns of each algorithm's result tuples (see the simulate_* functions of main.py)
+RESULT_COLUMNS = {
+	"semionline": ("delta", "ratio"),
+	"onlineML": ("epsilon", "k", "rmsd", "ratio"),
+	"semionlineML": ("delta", "epsilon", "k", "rmsd", "ratio"),
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+	id INTEGER PRIMARY KEY,
+	file TEXT NOT NULL,
+	n INTEGER NOT NULL,
+	seed INTEGER NOT NULL,
+	algorithm TEXT NOT NULL,
+	delta REAL,
+	epsilon REAL,
+	k INTEGER,
+	rmsd REAL,
+	ratio REAL NOT NULL,
+	runtime REAL,
+	created TEXT
+);
+CREATE INDEX IF NOT EXISTS results_cell ON results (algorithm, file, delta, epsilon, k);
+CREATE INDEX IF NOT EXISTS results_seed ON results (algorithm, file, seed);
+"""
+
+# A cell is stored at most once per seed (NULL parameters are compared as -1, since NULLs are never equal in SQL)
+CELL_KEY = "algorithm, file, seed, IFNULL(delta, -1), IFNULL(epsilon, -1), IFNULL(k, -1)"
+UNIQUE_INDEX = f"CREATE UNIQUE INDEX IF NOT EXISTS results_unique ON results ({CELL_KEY})"
+
+
+## SQLite storage of the simulation results (one row per (file, seed, algorithm, δ, ε, k) cell)
+## Safe to use from concurrent processes: writes are done in short transactions and the database
+## uses write-ahead logging, so readers never block writers
+class ResultsStore:
+	def __init__(self, db_path, timeout=60):
+		self.db_path = os.path.abspath(db_path)
+		self.connection = sqlite3.connect(self.db_path, timeout=timeout, isolation_level=None)
+		self.connection.execute("PRAGMA journal_mode=WAL")
+		self.connection.executescript(SCHEMA)
+		self._create_unique_index()
+
+
+	## Makes cells unique, removing the copies stored by older versions (e.g. a file imported twice)
+	def _create_unique_index(self):
+		try:
+			self.connection.execute(UNIQUE_INDEX)
+		except sqlite3.IntegrityError:
+			with Transaction(self.connection):
+				self.connection.execute(f"DELETE FROM results WHERE id NOT IN (SELECT MIN(id) FROM results GROUP BY {CELL_KEY})")
+				self.connection.execute(UNIQUE_INDEX)
+
+
+	def __enter__(self):
+		return self
+
+
+	def __exit__(self, *exc):
+		self.close()
+
+
+	def close(self):
+		self.connection.close()
+
+
+	## STATIC FUNCTION: Converts a result tuple of main.py into a row dictionary
+	## Input: simulated algorithm 'algorithm', single result tuple 'data'
+	def to_row(algorithm, data):
+		row = dict.fromkeys(("delta", "epsilon", "k", "rmsd"))
+		row.update(zip(RESULT_COLUMNS[algorithm], (float(d) for d in data)))
+		if row["k"] is not None:
+			row["k"] = int(row["k"])
+		return row
+
+
+	## Stores all the results of a single seed in one transaction
+	## Input: dataset name 'file', partition size 'n', 'seed', simulated 'algorithm', list of result tuples 'result',
+	##        time spent simulating the seed 'runtime' (seconds)
+	def insert_result(self, file, n, seed, algorithm, result, runtime=None):
+		self.insert_results([(file, n, seed, algorithm, result, runtime)])
+
+
+	## Stores the results of many seeds in one transaction
+	## Cells that are already stored are left unchanged, so storing the same results again is harmless,
+	## unless 'overwrite' is set: they are then replaced (deleted and stored again as new rows)
+	## Input: list of (file, n, seed, algorithm, result, runtime), replace stored cells toggle 'overwrite'
+	def insert_results(self, entries, overwrite=False):
+		created = datetime.now().isoformat(timespec="seconds")
+		rows = []
+		for file, n, seed, algorithm, result, runtime in entries:
+			for data in result:
+				row = ResultsStore.to_row(algorithm, data)
+				rows.append((file, n, seed, algorithm, row["delta"], row["epsilon"], row["k"],
+					row["rmsd"], row["ratio"], runtime, created))
+
+		# Replaced rows get new ids, so an incremental compile notices the deletion and rebuilds its state
+		insert, conflict = ("INSERT OR REPLACE", "") if overwrite else ("INSERT", " ON CONFLICT DO NOTHING")
+		with Transaction(self.connection):
+			self.connection.executemany(
+				f"{insert} INTO results (file, n, seed, algorithm, delta, epsilon, k, rmsd, ratio, runtime, created) "
+				f"VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?){conflict}", rows)
+
+			# Cells stored by checkpoints have no runtime yet (resumed seeds keep none, see main.run_task)
+			self.connection.executemany(
+				"UPDATE results SET runtime = ? WHERE algorithm = ? AND file = ? AND seed = ? AND runtime IS NULL",
+				[(runtime, algorithm, file, seed) for file, _, seed, algorithm, _, runtime in entries if runtime is not None])
+
+
+	## Reads the stored cells of a seed
+	## Output: dictionary (δ, ε, k) -> result tuple (columns of RESULT_COLUMNS[algorithm])
+	def get_cells(self, algorithm, file, seed):
+		cursor = self.connection.execute(
+			"SELECT delta, epsilon, k, rmsd, ratio FROM results WHERE algorithm = ? AND file = ? AND seed = ?",
+			(algorithm, file, seed))
+
+		cells = {}
+		for delta, epsilon, k, rmsd, ratio in cursor:
+			row = {"delta": delta, "epsilon": epsilon, "k": k, "rmsd": rmsd, "ratio": ratio}
+			cells[(delta, epsilon, k)] = tuple(row[column] for column in RESULT_COLUMNS[algorithm])
+		return cells
+
+
+	## Output: set of the 'seeds' that have stored cells for an algorithm and file
+	def get_stored_seeds(self, algorithm, file, seeds):
+		cursor = self.connection.execute(
+			"SELECT DISTINCT seed FROM results WHERE algorithm = ? AND file = ?", (algorithm, file))
+		return {seed for seed, in cursor} & set(seeds)
+
+
+	## Imports a text results file (e.g. preliminary_results.txt, results/metric/*.txt)
+	## The algorithm is inferred from the number of columns unless given
+	## Output: number of imported seeds
+	def import_text(self, file_path, algorithm=None):
+		entries = []
+		for header, result in read_text_results(file_path):
+			entry_algorithm = algorithm or infer_algorithm(result)
+			entries.append((header["file"], header["n"], header["seed"], entry_algorithm, result, None))
+
+		self.insert_results(entries)
+		return len(entries)
+
+
+	## Iterates over the rows stored after the row 'after_id' (in insertion order)
+	## Output: generator of (id, file, n, seed, algorithm, row dictionary)
+	def iter_rows(self, after_id=0):
+		cursor = self.connection.execute(
+			"SELECT id, file, n, seed, algorithm, delta, epsilon, k, rmsd, ratio "
+			"FROM results WHERE id > ? ORDER BY id", (after_id,))
+		for id, file, n, seed, algorithm, delta, epsilon, k, rmsd, ratio in cursor:
+			yield id, file, n, seed, algorithm, {"delta": delta, "epsilon": epsilon, "k": k, "rmsd": rmsd, "ratio": ratio}
+
+
+	## Number of rows stored up to (and including) the row 'last_id'
+	def count_rows(self, last_id=None):
+		if last_id is None:
+			return self.connection.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+		return self.connection.execute("SELECT COUNT(*) FROM results WHERE id <= ?", (last_id,)).fetchone()[0]
+
+
+## Durable record of the finished cells of a sweep, kept in the results database
+## Each process opens its own connection (SQLite connections cannot be shared between processes)
+class Checkpoint:
+	def __init__(self, db_path, resume=False, overwrite=False):
+		self.db_path = db_path
+		self.resume = resume
+		self.overwrite = overwrite		# Replace the cells stored by a previous run
+		self.resumed = set()		# (algorithm, file, seed) of the seeds with cells finished by a previous run
+		self.store = None
+		self.pid = None
+
+
+	def get_store(self):
+		if self.store is None or self.pid != os.getpid():
+			self.store = ResultsStore(self.db_path)
+			self.pid = os.getpid()
+		return self.store
+
+
+	## Reads the cells of a seed finished by a previous run
+	## Output: dictionary (δ, ε, k) -> result tuple (empty unless resuming)
+	def load(self, algorithm, file, seed):
+		if not self.resume:
+			return {}
+
+		cells = self.get_store().get_cells(algorithm, file, seed)
+		if cells:
+			self.resumed.add((algorithm, file, seed))
+		return cells
+
+
+	## Stores finished cells (one transaction)
+	## Input: simulated 'algorithm', dataset name 'file', partition size 'n', list of (seed, list of result tuples)
+	def save(self, algorithm, file, n, seed_results):
+		entries = [(file, n, seed, algorithm, result, None) for seed, result in seed_results]
+		self.get_store().insert_results(entries, self.overwrite)
+
+
+## Context manager for an immediate (write-locking) transaction
+class Transaction:
+	def __init__(self, connection):
+		self.connection = connection
+
+
+	def __enter__(self):
+		self.connection.execute("BEGIN IMMEDIATE")
+
+
+	def __exit__(self, exc_type, *exc):
+		self.connection.execute("ROLLBACK" if exc_type else "COMMIT")
+
+
+## Reads a text results file lazily
+## Format: '> file | date | Seed=seed | n=n' headers, each followed by rows of values separated by two tabs
+## Output: generator of (header dictionary, list of result tuples)
+def read_text_results(file_path):
+	for header, result, _ in read_text_chunks(file_path):
+		yield header, result
+
+
+## Reads a text results file lazily, starting at the byte 'offset' (which must be the start of a chunk)
+## If 'skip_unterminated' is set, a last line without a newline (e.g. still being written) and its chunk are not read
+## Output: generator of (header dictionary, list of result tuples, byte offset of the end of the chunk)
+def read_text_chunks(file_path, offset=0, skip_unterminated=False):
+	header = None
+	result = []
+	position = offset
+	end = offset
+
+	with open(file_path, "rb") as f:
+		f.seek(offset)
+		for raw_line in f:
+			if skip_unterminated and not raw_line.endswith(b"\n"):
+				return
+			position += len(raw_line)
+
+			line = raw_line.decode().strip()
+			if not line:
+				continue
+
+			if line[0] == ">":
+				# New chunk detected
+				if header is not None:
+					yield header, result, end
+				header = parse_header(line)
+				result = []
+			elif header is None:
+				raise Exception(f"{Fore.RED}{file_path}: result rows found before a header (offset {offset}){Fore.WHITE}")
+			else:
+				# Data detected
+				result.append(tuple(float(d) for d in line.split("\t\t")))
+			end = position
+
+	if header is not None:
+		yield header, result, end
+
+
+## Parses the header of a text results chunk
+## Input: '> file | date | Seed=seed | n=n'
+def parse_header(line):
+	header_list = [s.strip() for s in line[1:].split("|")]
+	return {
+		"file": header_list[0],
+		"seed": int(header_list[2].split("=")[1]),
+		"n": int(header_list[3].split("=")[1]),
+	}
+
+
+## Infers the algorithm of a result from the number of columns of its rows
+def infer_algorithm(result):
+	column_count = len(result[0]) if result else 0
+	for algorithm, columns in RESULT_COLUMNS.items():
+		if len(columns) == column_count:
+			return algorithm
+	raise Exception(f"{Fore.RED}Unknown result format ({column_count} columns){Fore.WHITE}")
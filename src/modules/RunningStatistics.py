@@ -0,0 +1,116 @@
+import math
+import numpy as np
+from functools import lru_cache
+
+## Single-pass (streaming) statistics of a series of values using Welford's algorithm
+## Memory use is constant regardless of the number of values
+class RunningStatistics:
+	def __init__(self):
+		self.count = 0
+		self.mean = 0.0
+		self.m2 = 0.0		# Sum of squared differences from the mean
+		self.min = math.inf
+		self.max = -math.inf
+
+
+	def __str__(self):
+		return f"count={self.count} | mean={self.mean} | std={self.get_std()} | min={self.min} | max={self.max}"
+
+	__repr__ = __str__
+
+
+	## Adds a value (None values are ignored)
+	def update(self, value):
+		if value is None:
+			return
+
+		self.count += 1
+		delta = value - self.mean
+		self.mean += delta / self.count
+		self.m2 += delta * (value - self.mean)
+
+		if value < self.min:
+			self.min = value
+		if value > self.max:
+			self.max = value
+
+
+	## Adds every value of an array at once
+	def update_array(self, values):
+		values = np.asarray(values, dtype=float).ravel()
+		if len(values) == 0:
+			return
+
+		block = RunningStatistics()
+		block.count = len(values)
+		block.mean = float(values.mean())
+		block.m2 = float(np.square(values - block.mean).sum())
+		block.min = float(values.min())
+		block.max = float(values.max())
+		self.merge(block)
+
+
+	## Combines the statistics of another RunningStatistics (Chan et al.'s parallel algorithm)
+	def merge(self, other):
+		if other.count == 0:
+			return
+		if self.count == 0:
+			self.count, self.mean, self.m2, self.min, self.max = other.count, other.mean, other.m2, other.min, other.max
+			return
+
+		count = self.count + other.count
+		delta = other.mean - self.mean
+		self.mean += delta * other.count / count
+		self.m2 += other.m2 + delta ** 2 * self.count * other.count / count
+		self.count = count
+		self.min = min(self.min, other.min)
+		self.max = max(self.max, other.max)
+
+
+	## Sample variance (0 if there are less than 2 values)
+	## Input: delta degrees of freedom 'ddof' (0 gives the population variance)
+	def get_variance(self, ddof=1):
+		if self.count <= ddof:
+			return 0.0
+		return self.m2 / (self.count - ddof)
+
+
+	## Sample standard deviation
+	def get_std(self):
+		return math.sqrt(self.get_variance())
+
+
+	## Confidence interval of the mean (Student's t-distribution)
+	## Output: (lower bound, upper bound)
+	def get_confidence_interval(self, confidence=0.95):
+		return get_confidence_interval(self.mean, self.get_std(), self.count, confidence)
+
+
+	## Values that can be restored with from_state (e.g. to persist the statistics)
+	def get_state(self):
+		return [self.count, self.mean, self.m2, self.min, self.max]
+
+
+	## STATIC FUNCTION: Restores a RunningStatistics saved with get_state
+	def from_state(state):
+		statistics = RunningStatistics()
+		statistics.count, statistics.mean, statistics.m2, statistics.min, statistics.max = state
+		return statistics
+
+
+## Confidence interval of a mean from its summary statistics (Student's t-distribution)
+## Input: sample 'mean', sample standard deviation 'std', sample size 'count', 'confidence' level
+## Output: (lower bound, upper bound)
+def get_confidence_interval(mean, std, count, confidence=0.95):
+	if count < 2:
+		return (mean, mean)
+
+	half_width = get_t_quantile((1 + confidence) / 2, count - 1) * std / math.sqrt(count)
+	return (mean - half_width, mean + half_width)
+
+
+## Quantile of Student's t-distribution (cached since compiled cells mostly share the same sample size)
+@lru_cache(maxsize=None)
+def get_t_quantile(q, degrees_of_freedom):
+	from scipy.stats import t
+	return float(t.ppf(q, degrees_of_freedom))
@@ -1,37 +1,179 @@
 ###
 # Plots the distribution of datasets
 # Additionally shows the quantitative descriptions of the dataset (i.e. mean, variance)
+# Weights are read in a single pass with bounded memory, so large datasets never have to fit in memory
 ###
 
+import os
+import re
 import argparse
-import statistics as st
 import numpy as np
-import matplotlib.pyplot as plt
 from colorama import Fore
+from concurrent.futures import ProcessPoolExecutor
+from modules.Dataset import iter_weight_blocks
+from modules.MetricSpace import is_synthetic
+from modules.RunningStatistics import RunningStatistics
 
 
+OUTPUT_DIR = "../results/dataset_distributions"		# Relative path
+VALID_EXT = ('.txt', '.npy')		# Valid input file extensions (.npy: binary dataset)
+RESOLUTION = 0.01		# Bin width of the histogram used for the median and mode (exact for weights with 2 decimals)
+PLOT_BINS = 10		# Number of bars of the plotted histogram
+
+
+## Streaming statistics of the weights of a dataset
+## Keeps running moments and a fixed-width histogram, so memory does not depend on the number of weights
+class DatasetStatistics:
+	def __init__(self, resolution=RESOLUTION):
+		self.resolution = resolution
+		self.statistics = RunningStatistics()
+		self.histogram = {}		# bin -> count of weights in [(bin - 0.5) * resolution, (bin + 0.5) * resolution)
+
+
+	## Adds a block of weights
+	def update(self, weights):
+		self.statistics.update_array(weights)
+
+		bins, counts = np.unique(np.rint(weights / self.resolution).astype(np.int64), return_counts=True)
+		for bin, count in zip(bins.tolist(), counts.tolist()):
+			self.histogram[bin] = self.histogram.get(bin, 0) + count
+
+
+	## Output: sorted bin values, count of each bin
+	def get_histogram(self):
+		bins = sorted(self.histogram)
+		values = np.round(np.array(bins, dtype=float) * self.resolution, 10)
+		return values, np.array([self.histogram[bin] for bin in bins])
+
+
+	## Median of the binned weights (average of the 2 middle weights for an even count)
+	def get_median(self):
+		values, counts = self.get_histogram()
+		cumulative = np.cumsum(counts)
+		total = cumulative[-1]
+
+		lower = values[np.searchsorted(cumulative, (total - 1) // 2, side="right")]
+		upper = values[np.searchsorted(cumulative, total // 2, side="right")]
+		return (lower + upper) / 2
+
+
+	## Most common binned weight (the smallest one if there are several)
+	def get_mode(self):
+		values, counts = self.get_histogram()
+		return values[np.argmax(counts)]
+
+
+	## Output: dictionary of the quantitative descriptions of the weights
+	def summarize(self):
+		return {
+			"count": self.statistics.count,
+			"mean": self.statistics.mean,
+			"median": float(self.get_median()),
+			"mode": float(self.get_mode()),
+			"variance": self.statistics.get_variance(ddof=0),
+			"min": self.statistics.min,
+			"max": self.statistics.max,
+		}
+
+
+## Reads a dataset in a single pass
+## Input: text/binary dataset path or synthetic source spec 'source'
+## Output: DatasetStatistics
+def get_dataset_statistics(source):
+	statistics = DatasetStatistics()
+	_, blocks = iter_weight_blocks(source)
+	for block in blocks:
+		statistics.update(block)
+	return statistics
+
+
+## Draws the histogram of a dataset on matplotlib axes 'ax'
+def plot_histogram(ax, statistics: DatasetStatistics, title):
+	values, counts = statistics.get_histogram()
+	ax.hist(values, bins=PLOT_BINS, weights=counts)
+	ax.set_title(title)
+	ax.set_xlabel("Weight")
+	ax.set_ylabel("Count")
+
+
+## Computes the statistics of a dataset and saves its histogram without a display
+## Input: dataset 'source', directory of the figures 'output_dir'
+## Output: summary dictionary, path to the saved figure
+def process_dataset(source, output_dir):
+	from matplotlib.figure import Figure
+
+	statistics = get_dataset_statistics(source)
+	name = re.sub(r"[^\w.=-]", "_", source) if is_synthetic(source) else os.path.splitext(os.path.basename(source))[0]
+
+	figure = Figure()
+	plot_histogram(figure.subplots(), statistics, name)
+	figure_path = os.path.join(output_dir, f"{name}.png")
+	figure.savefig(figure_path)
+
+	return statistics.summarize(), figure_path
+
+
+## Prints the quantitative descriptions of a dataset
+def display_summary(summary):
+	print(f"Mean: {Fore.GREEN}{summary['mean']}{Fore.WHITE}")
+	print(f"Median: {Fore.GREEN}{summary['median']}{Fore.WHITE}")
+	print(f"Mode: {Fore.GREEN}{summary['mode']}{Fore.WHITE}")
+	print(f"Variance: {Fore.GREEN}{summary['variance']}{Fore.WHITE}")
+
+
+## Converts a relative (to this file) path to an absolute path
+## Input: directory containing file 'rel_dir', raw 'file_name'
+## Output: absolute path to a single file
+def rel2abs_path(rel_dir, file_name):
+	dir = os.path.dirname(__file__)
+	rel_path = os.path.join(dir, rel_dir, file_name)
+	return os.path.abspath(rel_path)
+
 
 if __name__ == "__main__":
 	# Parameters
 	parser = argparse.ArgumentParser()
 
 	parser.add_argument("path",
-			help="Path to input")
+			help="Path to input (dataset file, directory of datasets or 'synthetic:n=<n>[,seed=<seed>]')")
+	parser.add_argument("-o", "--output", default=rel2abs_path('.', OUTPUT_DIR),
+			help="Directory where the figures are saved")
+	parser.add_argument("-j", "--jobs", type=int, default=1,
+			help="Number of worker processes (0 uses all CPUs)")
+	parser.add_argument("--show", action='store_true',
+			help="Show the histogram of a single dataset instead of saving it")
 
 	args = parser.parse_args()
 
-	arr = []
-	with open(args.path, "r") as f:
-		f.readline()
-
-		for line in f:
-			arr = np.append(arr, list(map(float, line.strip().split(" "))))
-	
-	arr = [int(x) for x in arr]
-	print(f"Mean: {Fore.GREEN}{np.mean(arr)}{Fore.WHITE}")
-	print(f"Median: {Fore.GREEN}{np.median(arr)}{Fore.WHITE}")
-	print(f"Mode: {Fore.GREEN}{st.mode(arr)}{Fore.WHITE}")
-	print(f"Variance: {Fore.GREEN}{np.var(arr)}{Fore.WHITE}")
-
-	plt.hist(arr)
-	plt.show()
\ No newline at end of file
+	input_files = []
+	path = os.path.abspath(args.path)
+	if is_synthetic(args.path):
+		input_files.append(args.path)
+	elif os.path.isfile(path):
+		input_files.append(path)
+	elif os.path.isdir(path):
+		for file in sorted(os.listdir(path)):
+			if file.endswith(VALID_EXT):
+				input_files.append(os.path.join(path, file))
+	else:
+		raise Exception(f"{Fore.RED}Invalid path argument!{Fore.WHITE}")
+
+	if args.show:
+		import matplotlib.pyplot as plt
+
+		if len(input_files) != 1:
+			raise Exception(f"{Fore.RED}--show expects a single dataset{Fore.WHITE}")
+
+		statistics = get_dataset_statistics(input_files[0])
+		display_summary(statistics.summarize())
+		plot_histogram(plt.gca(), statistics, os.path.basename(input_files[0]))
+		plt.show()
+	else:
+		os.makedirs(args.output, exist_ok=True)
+
+		with ProcessPoolExecutor(max_workers=args.jobs or os.cpu_count()) as executor:
+			results = executor.map(process_dataset, input_files, [args.output] * len(input_files))
+			for file, (summary, figure_path) in zip(input_files, results):
+				print(f"=== File: {os.path.basename(file)} ===")
+				display_summary(summary)
+				print(f"{Fore.GREEN}Figure saved in {figure_path}{Fore.WHITE}")
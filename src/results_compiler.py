@@ -1,128 +1,305 @@
 ###
-# Averages results with the same n in prelimenary_results.txt to compiled_results.txt
-# NOTE: Make sure not to try to compile data with incompatible algorithms or data sets
+# Compiles the results database (or text results files such as prelimenary_results.txt) to compiled_results.txt
+# Every (file, algorithm, δ, ε, k) cell is reduced to the mean, standard deviation, min/max and 95% confidence
+# interval of its competitive ratios using running (single-pass) statistics
+# The statistics are saved in compiled_results.state.json, so the next compile only reads the new results
 ###
 
 import os
+import json
+import hashlib
+import argparse
+import itertools
 from colorama import Fore
+from modules.ResultsStore import ResultsStore, RESULT_COLUMNS, read_text_chunks, infer_algorithm
+from modules.RunningStatistics import RunningStatistics, get_confidence_interval
 
 
 PRELIMS_FILE = "../preliminary_results.txt"		# Relative path
 RESULTS_FILE = "../compiled_results.txt"		# Relative path
+RESULTS_DB = "../results.db"		# Relative path
+CONFIDENCE = 0.95		# Confidence level of the compiled intervals
+STATE_FILE = "../compiled_results.state.json"		# Relative path, aggregation state of the last compile
+STATE_VERSION = 1
+FINGERPRINT_SIZE = 4096		# Bytes hashed at each end of the compiled part of a text results file
+STAT_COLUMNS = ("ratio_mean", "ratio_std", "ratio_min", "ratio_max", "ratio_ci_low", "ratio_ci_high")
+
+
+## Running statistics of the results of one algorithm on one file
+## Every (δ, ε, k) cell keeps a constant amount of memory, no matter how many seeds are added; only the set of
+## seeds grows with them (one integer per seed, listed in the compiled header and used to skip copied seeds)
+class Chunk:
+	def __init__(self, algorithm, file, n):
+		self.algorithm = algorithm
+		self.file = file
+		self.n = n
+		self.seeds = set()		# Seeds with at least one added cell
+		self.cells = {}		# (δ, ε, k) -> (rmsd RunningStatistics, ratio RunningStatistics)
 
 
-## Storage container for results
-class Result:
-	def __init__(self, header):
-		# Prepare header information
-		header_list = header.split("|")
-		header_list[0] = header_list[0][1:]
-		header_list = [s.strip() for s in header_list]
+	def __str__(self):
+		return f"{self.file} | Algorithm={self.algorithm} | n={self.n} | Seeds={sorted(self.seeds)}"
 
-		# Extract info from header
-		self.file = header_list[0]
-		# self.date_created = datetime.strptime(header_list[1], "%d %B %Y, %H:%M:%S")	# No need to store date
-		self.seeds = [int(header_list[2].split("=")[1])]
-		self.n = int(header_list[3].split("=")[1])
-		
-		# Initialize results list
-		self.data = []
+	__repr__ = __str__
 
 
-	def __str__(self):
-		return f"{self.file} | n={self.n} | Seeds={self.seeds}"
+	## Adds the result tuples of a single seed (cells are matched by their δ, ε and k values)
+	## Output: False if the seed was already added (copies are skipped)
+	def insert_result(self, seed, result):
+		return self.insert_rows(seed, [ResultsStore.to_row(self.algorithm, data) for data in result])
 
-	__repr__ = __str__
 
+	## Adds the row dictionaries (see ResultsStore.to_row) of a single seed
+	## Output: False if the seed was already added (copies are skipped)
+	def insert_rows(self, seed, rows):
+		if seed in self.seeds:
+			return False
 
-	## Inserts data to data dictionary
-	def insert_data(self, data_list):
-		self.data.append([float(d) for d in data_list])
+		for row in rows:
+			self.insert_row(seed, row)
+		return True
 
-		
-	def combine_data(self, index, new_value):
-		count = len(self.seeds)
-		total = self.data[index][-1] * count
-		self.data[index][-1] = (total + new_value) / (count + 1)
 
+	## Adds a single row dictionary of a seed (no copy check: the caller guarantees the cell is new for the seed)
+	def insert_row(self, seed, row):
+		self.seeds.add(seed)
+		key = (row["delta"], row["epsilon"], row["k"])
+		if key not in self.cells:
+			self.cells[key] = (RunningStatistics(), RunningStatistics())
 
-	## Combines the data of another Results class by averaging them
-	def combine(self, new_result):
-		for i in range(len(new_result.data)):
-			new_value = new_result.data[i][-1]
-			self.combine_data(i, new_value)
-		self.seeds.append(new_result.seeds[0])
+		rmsd, ratio = self.cells[key]
+		rmsd.update(row["rmsd"])
+		ratio.update(row["ratio"])
 
 
-## Reads and stores all the results in a single array
-## Input: Relative path to results file 'results'
-## Output: List of Result objects
-def read_results(file_path):
-	results = []
-	in_chunk = False	# Tracks if reading results from a single file 
+	## Output: list of cell dictionaries (algorithm, file, δ, ε, k, n, count, seeds, average rmsd and ratio,
+	##         ratio_std, ratio_min, ratio_max)
+	def summarize(self):
+		compiled = []
+		for (delta, epsilon, k), (rmsd, ratio) in self.cells.items():
+			compiled.append({"algorithm": self.algorithm, "file": self.file, "delta": delta, "epsilon": epsilon, "k": k,
+				"n": self.n, "count": ratio.count, "seeds": sorted(self.seeds),
+				"rmsd": rmsd.mean if rmsd.count else None, "ratio": ratio.mean,
+				"ratio_std": ratio.get_std(), "ratio_min": ratio.min, "ratio_max": ratio.max})
+		return compiled
+
+
+	## Output: JSON serializable state (restored with from_state)
+	def get_state(self):
+		return {
+			"algorithm": self.algorithm, "file": self.file, "n": self.n, "seeds": sorted(self.seeds),
+			"cells": [[*key, rmsd.get_state(), ratio.get_state()] for key, (rmsd, ratio) in self.cells.items()],
+		}
 
-	with open(rel2abs_path('.', file_path), "r") as f:
+
+	## STATIC FUNCTION: Restores a Chunk saved with get_state
+	def from_state(state):
+		chunk = Chunk(state["algorithm"], state["file"], state["n"])
+		chunk.seeds = set(state["seeds"])
+		for delta, epsilon, k, rmsd, ratio in state["cells"]:
+			chunk.cells[(delta, epsilon, k)] = (RunningStatistics.from_state(rmsd), RunningStatistics.from_state(ratio))
+		return chunk
+
+
+## Aggregated results and the position up to which each source was read (high-water marks)
+## Persisted between runs so that only the results appended since the last compile are read
+class CompileState:
+	def __init__(self, sources):
+		self.sources = sources		# Text results files or results database, in reading order
+		self.marks = {}		# source -> high-water mark
+		self.chunks = {}		# (algorithm, file) -> Chunk
+
+
+	## Adds the result tuples of a single seed
+	def insert(self, algorithm, file, n, seed, result):
+		return self.get_chunk(algorithm, file, n).insert_result(seed, result)
+
+
+	## Adds a single row of a seed (see Chunk.insert_row)
+	def insert_row(self, algorithm, file, n, seed, row):
+		self.get_chunk(algorithm, file, n).insert_row(seed, row)
+
+
+	## Output: Chunk of an algorithm and file (created if missing)
+	def get_chunk(self, algorithm, file, n):
+		key = (algorithm, file)
+		if key not in self.chunks:
+			self.chunks[key] = Chunk(algorithm, file, n)
+		return self.chunks[key]
+
+
+	## Output: list of cell dictionaries sorted by algorithm and file
+	def summarize(self):
+		compiled = []
+		for key in sorted(self.chunks):
+			compiled += self.chunks[key].summarize()
+		return compiled
+
+
+	## Writes the state atomically (temporary file + rename)
+	def save(self, file_path):
+		state = {
+			"version": STATE_VERSION, "sources": self.sources, "marks": self.marks,
+			"chunks": [chunk.get_state() for chunk in self.chunks.values()],
+		}
+
+		temp_path = f"{file_path}.{os.getpid()}.tmp"
+		with open(temp_path, "w") as f:
+			f.write(json.dumps(state))
+		os.replace(temp_path, file_path)
+
+
+	## STATIC FUNCTION: Loads the state saved by a compile of the same sources
+	## Output: CompileState (None if there is no compatible state)
+	def load(file_path, sources):
+		try:
+			with open(file_path, "r") as f:
+				state = json.load(f)
+		except (OSError, ValueError):
+			return None
+
+		if state.get("version") != STATE_VERSION or state.get("sources") != sources:
+			return None
+
+		compile_state = CompileState(sources)
+		compile_state.marks = state["marks"]
+		for chunk_state in state["chunks"]:
+			chunk = Chunk.from_state(chunk_state)
+			compile_state.chunks[(chunk.algorithm, chunk.file)] = chunk
+		return compile_state
+
+
+## Reads the results appended to a text results file since its high-water mark
+## A seed whose last line is still being written is left for the next compile
+## Input: compile state 'state' (updated in place), path to results file 'file_path'
+## Output: False if the file was truncated or rewritten since the last compile (the state must be rebuilt)
+def update_text_source(state: CompileState, file_path):
+	mark = state.marks.get(file_path, {"offset": 0, "fingerprint": None})
+	offset = mark["offset"]
+	if os.path.getsize(file_path) < offset or get_fingerprint(file_path, offset) != mark["fingerprint"]:
+		return False
+	if not is_chunk_start(file_path, offset):
+		# Rows were appended to an already compiled seed
+		return False
+
+	for header, result, end in read_text_chunks(file_path, offset, skip_unterminated=True):
+		state.insert(infer_algorithm(result), header["file"], header["n"], header["seed"], result)
+		offset = end
+
+	state.marks[file_path] = {"offset": offset, "fingerprint": get_fingerprint(file_path, offset)}
+	return True
+
+
+## Reads the rows inserted in the results database since its high-water mark (last row id)
+## Input: compile state 'state' (updated in place), open results database 'store'
+## Output: False if rows were deleted since the last compile (the state must be rebuilt)
+def update_db_source(state: CompileState, store: ResultsStore):
+	mark = state.marks.get(store.db_path, {"last_id": 0, "count": 0})
+	if store.count_rows(mark["last_id"]) != mark["count"]:
+		return False
+
+	# Every row is a distinct (seed, δ, ε, k) cell (see ResultsStore.UNIQUE_INDEX), so rows are added one by one:
+	# the cells of a seed may be split across checkpoints, interleaved with other seeds and compiles
+	last_id, count = mark["last_id"], mark["count"]
+	for id, file, n, seed, algorithm, row in store.iter_rows(last_id):
+		state.insert_row(algorithm, file, n, seed, row)
+		last_id = id
+		count += 1
+
+	state.marks[store.db_path] = {"last_id": last_id, "count": count}
+	return True
+
+
+## Identifies the content of a file before byte 'offset' without reading all of it
+## Output: hash of the first and last FINGERPRINT_SIZE bytes before 'offset' (None if 'offset' is 0)
+def get_fingerprint(file_path, offset):
+	if offset == 0:
+		return None
+
+	with open(file_path, "rb") as f:
+		digest = hashlib.sha1(f.read(min(offset, FINGERPRINT_SIZE)))
+		f.seek(max(offset - FINGERPRINT_SIZE, 0))
+		digest.update(f.read(offset - f.tell()))
+	return digest.hexdigest()
+
+
+## Checks if the next non-blank line after byte 'offset' is a chunk header (or if there is none)
+def is_chunk_start(file_path, offset):
+	with open(file_path, "rb") as f:
+		f.seek(offset)
 		for line in f:
 			line = line.strip()
-			if line[0] == ">":
-				# New chunk detected
-				if in_chunk:
-					# Save current chunk
-					results.append(R)
-					in_chunk = False
-
-				in_chunk = True
-				R = Result(line)
-			else:
-				# Data detected
-				data = line.split("\t\t")
-				R.insert_data(data)
-		else:
-			# Save current chunk
-			results.append(R)
-
-	return results
-
-
-## Reads through the results and combines the same file names with different seeds
-## Input: List of Result objects 'results'
-## Output: Processed list of Result objects
-def combine_results(results):
-	unique_indices = {}		# Stores indices of unique file names
-
-	for i in range(len(results)):
-		r_curr: Result = results[i]
-		if not r_curr.file in unique_indices:
-			# Current i is unique (so far)
-			unique_indices[r_curr.file] = i
-			continue
-
-		r_base: Result = results[unique_indices[r_curr.file]]
-		if r_curr.seeds[0] in r_base.seeds:
-			# Marks current i as a copy
-			results[i] = None
-			continue
-
-		# Combine's the current i with base
-		r_base.combine(r_curr)
-		results[i] = None
-
-	# Removes processed items (None type) in the list
-	return [r for r in results if r != None]
-
-
-## Appends Result data in the RESULTS_FILE
-def store_result(result: Result):
-	header = f"> {result.file} | n={result.n} | Count={len(result.seeds)} | Seeds={result.seeds}\n"
-
-	with open(rel2abs_path('.', RESULTS_FILE), "a") as f:
-		# Stores header
-		f.write(header)
-		
-		# Stores results line by line
-		for i in range(len(result.data)):
-			entry = "\t\t".join(str(d) for d in result.data[i])
-			f.write(f"{entry}\n")
+			if line:
+				return line[:1] == b">"
+	return True
+
+
+## Brings the compile state of some sources up to date, reusing the state of the previous compile if possible
+## Input: list of sources 'sources', function reading a source into a state 'update' (see update_*_source),
+##        force a full rebuild 'rebuild'
+## Output: up to date CompileState
+def update_state(sources, update, rebuild=False):
+	state = None if rebuild else CompileState.load(rel2abs_path('.', STATE_FILE), sources)
+	if state is not None and all(update(state, source) for source in sources):
+		return state
+
+	if state is not None:
+		print(f"{Fore.YELLOW}Results were rewritten since the last compile, rebuilding...{Fore.WHITE}")
+
+	state = CompileState(sources)
+	for source in sources:
+		update(state, source)
+	return state
+
+
+## Writes compiled cells in the RESULTS_FILE (one chunk per algorithm and file)
+## Each row holds the δ, ε, k (and average rmsd) columns of the algorithm, followed by the mean, standard
+## deviation, min, max and 95% confidence interval of the competitive ratio
+## Input: cell dictionaries sorted by algorithm and file 'compiled'
+## Output: number of compiled chunks
+def store_compiled(compiled):
+	chunks = itertools.groupby(compiled, key=lambda c: (c["algorithm"], c["file"]))
+	chunk_count = 0
+
+	with open(rel2abs_path('.', RESULTS_FILE), "w") as f:
+		for (algorithm, file), cells in chunks:
+			cells = list(cells)
+			seeds = sorted(set().union(*(cell["seeds"] for cell in cells)))
+			columns = RESULT_COLUMNS[algorithm][:-1] + STAT_COLUMNS
+			header = (f"> {file} | Algorithm={algorithm} | n={cells[0]['n']} | Count={len(seeds)} | Seeds={seeds} | "
+				f"Columns={','.join(columns)}\n")
+			f.write(header)
+
+			# Stores results line by line
+			for cell in cells:
+				ci_low, ci_high = get_confidence_interval(cell["ratio"], cell["ratio_std"], cell["count"], CONFIDENCE)
+				values = [cell[column] for column in RESULT_COLUMNS[algorithm][:-1]]
+				values += [cell["ratio"], cell["ratio_std"], cell["ratio_min"], cell["ratio_max"], ci_low, ci_high]
+				entry = "\t\t".join(str(v) for v in values)
+				f.write(f"{entry}\n")
+			chunk_count += 1
+
+	return chunk_count
+
+
+## Compiles the results database into the RESULTS_FILE
+## Output: number of compiled chunks
+def store_compiled_db(store: ResultsStore, rebuild=False):
+	state = update_state([store.db_path], lambda state, _: update_db_source(state, store), rebuild)
+	chunk_count = store_compiled(state.summarize())
+	state.save(rel2abs_path('.', STATE_FILE))
+	return chunk_count
+
+
+## Compiles text results files into the RESULTS_FILE
+## Input: list of paths to text results files 'file_paths'
+## Output: number of compiled chunks
+def store_compiled_text(file_paths, rebuild=False):
+	sources = [os.path.abspath(file_path) for file_path in file_paths]
+	state = update_state(sources, update_text_source, rebuild)
+	chunk_count = store_compiled(state.summarize())
+	state.save(rel2abs_path('.', STATE_FILE))
+	return chunk_count
 
 
 ## Converts a relative (to this file) path to an absolute path
@@ -135,14 +312,27 @@ def rel2abs_path(rel_dir, file_name):
 
 
 if __name__ == "__main__":
-	# Compiles results
-	prelims = read_results(PRELIMS_FILE)
-	results = combine_results(prelims)
-
-	# Store results in file
-	out_path = rel2abs_path('.', RESULTS_FILE) 
-	open(out_path, "w").close()
-	for r in results:
-		store_result(r)
-
-	print(f"{Fore.GREEN}Results saved in {out_path}{Fore.WHITE}")
\ No newline at end of file
+	# Parameters
+	parser = argparse.ArgumentParser()
+
+	parser.add_argument("-i", "--import", dest="imports", nargs="+", default=[],
+			help="Text results file(s) to import in the results database before compiling")
+	parser.add_argument("--text", nargs="*", default=None,
+			help=f"Compile text results file(s) instead of the results database (default: {PRELIMS_FILE})")
+	parser.add_argument("--full", action='store_true',
+			help="Recompile all the results instead of only the ones added since the last compile")
+
+	args = parser.parse_args()
+	out_path = rel2abs_path('.', RESULTS_FILE)
+
+	if args.text is not None:
+		store_compiled_text(args.text or [rel2abs_path('.', PRELIMS_FILE)], args.full)
+	else:
+		with ResultsStore(rel2abs_path('.', RESULTS_DB)) as store:
+			for path in args.imports:
+				count = store.import_text(path)
+				print(f"Imported {count} seed(s) from {path}")
+
+			store_compiled_db(store, args.full)
+
+	print(f"{Fore.GREEN}Results saved in {out_path}{Fore.WHITE}")
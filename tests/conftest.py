@@ -0,0 +1,12 @@
+import os
+import sys
+
+# The simulations import their modules relative to src/ (e.g. 'from modules.GraphAP import GraphAP')
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+DATASETS_DIR = os.path.join(os.path.dirname(__file__), "..", "datasets")
+
+
+## Path of a shipped dataset, e.g. dataset_path(100) -> datasets/metric100.txt
+def dataset_path(n):
+	return os.path.abspath(os.path.join(DATASETS_DIR, f"metric{n}.txt"))
@@ -0,0 +1,192 @@
+import random
+import pytest
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+from modules.GraphAP import GraphAP, get_hash_set_order
+from modules.Dataset import load_weights
+from modules.IncrementalAssignment import IncrementalAssignment
+from modules import IncrementalAssignment as IncrementalAssignment_module
+from modules import Kernels
+from conftest import dataset_path
+
+
+def test_hash_set_order_matches_set_iteration():
+	rng = random.Random(3)
+	for _ in range(500):
+		n = rng.choice([10, 100, 300, 800, rng.randint(1, 3000)])
+		cols = sorted(rng.sample(range(n), rng.randint(0, n)))
+		keys = tuple(c + n for c in cols)
+		assert get_hash_set_order(keys) == list({v for v in keys})
+
+
+def test_solve_assignment_matches_subproblem():
+	rng = np.random.RandomState(5)
+	weights = np.round(rng.rand(60, 60) * 10, 1)		# Many ties between optima
+	cols = np.flatnonzero(rng.rand(60) < 0.6)
+
+	row_ind, col_ind, total = GraphAP.solve_assignment(weights, cols=cols)
+	assert len(set(col_ind.tolist())) == len(cols) and set(col_ind.tolist()) == set(cols.tolist())
+	assert np.all(np.diff(row_ind) > 0)
+	sub_weights = weights[:, cols]
+	assert np.isclose(total, sub_weights[linear_sum_assignment(sub_weights)].sum())
+
+
+## Solves random column subproblems warm and cold
+## Output: number of subproblems solved by the warm start (the others fell back to a cold solve)
+def compare_warm_and_cold(weights, subproblems, seed=0):
+	n = len(weights)
+	row_ind, col_ind, _ = GraphAP.solve_assignment(weights)
+	engine = IncrementalAssignment(weights, row_ind, col_ind)
+	rng = np.random.RandomState(seed)
+
+	warm_count = 0
+	for _ in range(subproblems):
+		cols = np.sort(rng.choice(n, rng.randint(1, n), replace=False))
+		solution = engine.solve_columns(cols)
+		if solution is None:
+			continue
+
+		cold_row_ind, cold_col_ind, _ = GraphAP.solve_assignment(weights, cols=cols)
+		np.testing.assert_array_equal(solution[0], cold_row_ind)
+		np.testing.assert_array_equal(solution[1], cold_col_ind)
+		warm_count += 1
+	return warm_count
+
+
+def test_warm_start_matches_cold_solve_on_datasets():
+	for n in (100, 200):
+		weights = load_weights(dataset_path(n), use_cache=False, progress=False)
+		assert compare_warm_and_cold(weights, 30) > 0
+
+
+def test_warm_start_matches_cold_solve_with_ties():
+	rng = np.random.RandomState(7)
+	for decimals in (0, 1, 2):
+		weights = np.round(rng.rand(40, 40) * 20, decimals)
+		compare_warm_and_cold(weights, 40, seed=decimals)
+
+
+def test_warm_start_repairs_are_optimal():
+	rng = np.random.RandomState(11)
+	weights = np.round(rng.rand(50, 50) * 100, 2)
+	row_ind, col_ind, _ = GraphAP.solve_assignment(weights)
+	engine = IncrementalAssignment(weights, row_ind, col_ind)
+	assert engine.costs is not None
+
+	for _ in range(20):
+		cols = np.sort(rng.choice(50, rng.randint(1, 50), replace=False))
+		is_known = np.zeros(50, dtype=bool)
+		is_known[cols] = True
+
+		# Same repairs with the numpy path and the kernel (compiled only if Numba is installed)
+		shift = engine.row_duals.max()
+		states = []
+		for use_kernel in (False, True):
+			u, v = engine.row_duals - shift, engine.col_duals + shift
+			col4row = engine.col4row.copy()
+			row4col = np.full(50, -1, dtype=np.int64)
+			row4col[col4row] = np.arange(50)
+			freed = np.flatnonzero(~is_known[col4row])
+			col4row[freed] = -1
+			row4col[~is_known] = -1
+			if use_kernel:
+				Kernels.repair_assignment(engine.costs, u, v, col4row, row4col, is_known, freed)
+			else:
+				for row in freed:
+					engine._repair_row(row, u, v, col4row, row4col, is_known)
+			states.append((col4row, u, v))
+
+		for col4row, u, v in states:
+			np.testing.assert_array_equal(col4row, states[0][0])
+			reduced_costs = engine.costs[:, cols] - u[:, None] - v[cols]
+			assert reduced_costs.min() >= 0 and u.max() <= 0 and (u[col4row < 0] == 0).all()
+			matched = np.flatnonzero(col4row >= 0)
+			assert (reduced_costs[matched, np.searchsorted(cols, col4row[matched])] == 0).all()
+
+			cold_sum = weights[:, cols][linear_sum_assignment(weights[:, cols])].sum()
+			assert np.isclose(weights[matched, col4row[matched]].sum(), cold_sum)
+
+
+def test_warm_start_is_disabled_for_unscaled_weights():
+	weights = np.random.RandomState(2).rand(20, 20)
+	row_ind, col_ind, _ = GraphAP.solve_assignment(weights)
+	assert IncrementalAssignment(weights, row_ind, col_ind).solve_columns(np.arange(10)) is None
+
+
+def test_semionline_sweep_is_unchanged_by_warm_start():
+	import io, contextlib
+	import main
+
+	G = GraphAP(dataset_path(100), use_cache=False)
+	results = []
+	for enabled in (False, True):
+		IncrementalAssignment_module.enable(enabled)
+		try:
+			with contextlib.redirect_stdout(io.StringIO()):
+				results.append(main.simulate_semionline(G, 2344367245))
+		finally:
+			IncrementalAssignment_module.enable(False)
+	assert results[0] == results[1]
+
+
+def test_get_closest_skips_matched_neighbours():
+	G = GraphAP(dataset_path(100), use_cache=False)
+	n = G.n
+	v = n
+	neighbours = G.sorted_edges[v]
+
+	# Matches the 40 closest neighbours: the next query returns the 41st (or a tie of it) and keeps the cursor there
+	G.matched[neighbours[:40]] = True
+	u = G.get_closest(v, draw=0.0)
+	assert not G.matched[u]
+	assert G.weights[u][v - n] == G.weights[neighbours[40]][v - n]
+	assert G.cursors[v] == 40
+
+	G.matched[neighbours] = True
+	with pytest.raises(Exception, match="not found"):
+		G.get_closest(v, draw=0.0)
+	assert G.cursors[v] == len(neighbours)
+
+
+def test_constructors_forward_cache_toggles(monkeypatch):
+	from modules import OptimumCache
+
+	calls = []
+	monkeypatch.setattr(OptimumCache, "load_optimum", lambda key: calls.append("load"))
+	monkeypatch.setattr(OptimumCache, "write_optimum", lambda key, optimum: calls.append("write"))
+
+	GraphAP.from_synthetic("synthetic:n=30,seed=3", use_cache=False)
+	assert calls == []
+	GraphAP.from_synthetic("synthetic:n=30,seed=3", rebuild_cache=True)
+	assert calls == ["write"]
+	GraphAP.from_matrix(np.ones((5, 5)))
+	assert calls == ["write", "load", "write"]
+
+
+def test_optimum_cache_stores_the_dual_potentials(tmp_path, monkeypatch):
+	from modules import OptimumCache
+	monkeypatch.setattr(OptimumCache, "OPTIMUM_DIR", str(tmp_path))
+
+	weights = load_weights(dataset_path(100), use_cache=False, progress=False)
+	solved = GraphAP.get_optimum(weights)
+	cached = GraphAP.get_optimum(weights)
+	assert len(list(tmp_path.iterdir())) == 1
+
+	engine = IncrementalAssignment(weights, cached["row_ind"], cached["col_ind"])
+	for optimum in (solved, cached):
+		np.testing.assert_array_equal(optimum["row_duals"], engine.row_duals)
+		np.testing.assert_array_equal(optimum["col_duals"], engine.col_duals)
+
+	# The warm start of a cached graph uses the stored potentials
+	G = GraphAP.from_matrix(weights)
+	assert G.karp_duals is not None
+	cols = np.arange(0, 100, 3)
+	assert np.array_equal(G.get_incremental_assignment().row_duals, engine.row_duals)
+	for a, b in zip(G.get_incremental_assignment().solve_columns(cols) or (), engine.solve_columns(cols) or ()):
+		np.testing.assert_array_equal(a, b)
+
+	# Weights without an exact integer scaling have no potentials
+	unscaled = np.random.RandomState(3).rand(10, 10)
+	GraphAP.get_optimum(unscaled)
+	assert GraphAP.get_optimum(unscaled)["row_duals"] is None
+	assert GraphAP.from_matrix(unscaled).karp_duals is None
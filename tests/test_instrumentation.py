@@ -0,0 +1,19 @@
+from modules import Instrumentation
+
+
+def test_peak_rss_is_snapshot_when_the_scope_closes(monkeypatch):
+	peaks = iter([10.0, 20.0, 30.0])
+	monkeypatch.setattr(Instrumentation, "get_peak_rss_mb", lambda: next(peaks))
+	monkeypatch.setattr(Instrumentation, "ENABLED", True)
+	monkeypatch.setattr(Instrumentation, "records", [])
+	monkeypatch.setattr(Instrumentation, "scopes", [Instrumentation.Record({})])
+
+	with Instrumentation.scope(seed=1):
+		Instrumentation.count("queries")
+	with Instrumentation.scope(seed=2):
+		Instrumentation.count("queries")
+	Instrumentation.count("queries")
+
+	report = Instrumentation.collect()
+	assert [record["seed"] for record in report] == [1, 2, None]
+	assert [record["peak_rss_mb"] for record in report] == [10.0, 20.0, 30.0]
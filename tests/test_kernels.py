@@ -0,0 +1,90 @@
+import pytest
+import numpy as np
+import main
+from modules.GraphAP import GraphAP
+from modules.GraphML import GraphML
+from modules import Kernels
+from conftest import dataset_path
+
+SEEDS = [2344367245, 11]
+DELTAS = [0, 0.25, 0.5, 0.75, 1]
+
+# Kernels.ENABLED is set directly, so the kernels also run (uncompiled) when Numba is not installed
+
+
+@pytest.fixture(scope="module")
+def graph():
+	return GraphML(dataset_path(100), use_cache=False)
+
+
+## Runs a function with the kernels and with the NumPy paths
+## Output: (kernel result, NumPy result)
+def run_both(monkeypatch, function):
+	results = []
+	for enabled in (True, False):
+		monkeypatch.setattr(Kernels, "ENABLED", enabled)
+		results.append(function())
+	return results
+
+
+@pytest.mark.parametrize("rng_mode", ["legacy", "stream"])
+def test_semionline_kernels_match_numpy(graph, rng_mode, monkeypatch):
+	monkeypatch.setattr(main, "RNG_MODE", rng_mode)
+
+	def run():
+		matchings = []
+		for seed in SEEDS:
+			for delta in DELTAS:
+				graph.flush()
+				rng = main.get_rng(graph, seed, delta)
+				matchings.append(main.semionline(graph, delta, rng))
+				matchings.append(rng.random())		# Same state of the generator afterwards
+		return matchings
+
+	compiled, numpy = run_both(monkeypatch, run)
+	assert compiled == numpy
+
+
+@pytest.mark.parametrize("rng_mode", ["legacy", "stream"])
+def test_batch_kernels_match_numpy(graph, rng_mode, monkeypatch):
+	monkeypatch.setattr(main, "RNG_MODE", rng_mode)
+
+	def run():
+		matchings = []
+		for delta in DELTAS:
+			rngs = [main.get_rng(graph, seed, delta, independent=True) for seed in SEEDS]
+			matchings.append(main.semionline_batch(graph, delta, rngs))
+		return matchings
+
+	compiled, numpy = run_both(monkeypatch, run)
+	for (compiled_matchings, compiled_matched), (numpy_matchings, numpy_matched) in zip(compiled, numpy):
+		np.testing.assert_array_equal(compiled_matchings, numpy_matchings)
+		np.testing.assert_array_equal(compiled_matched, numpy_matched)
+
+
+@pytest.mark.parametrize("make_rng", [np.random.RandomState, np.random.default_rng])
+def test_perturbed_weights_kernels_match_numpy(graph, make_rng, monkeypatch):
+	def run():
+		rng = make_rng(5)
+		# k = 50 puts many edges near the minimum/maximum (perturbed in a fixed direction, no coin flip)
+		weights = [graph.generate_perturbed_weights(delta, epsilon, k, rng=rng)
+			for delta, epsilon, k in [(0.5, 0.3, 30), (1, 0.5, 50), (0.25, 0.1, 10)]]
+		return weights, rng.random()
+
+	(compiled_weights, compiled_next), (numpy_weights, numpy_next) = run_both(monkeypatch, run)
+	for compiled, numpy in zip(compiled_weights, numpy_weights):
+		np.testing.assert_array_equal(compiled, numpy)
+	assert compiled_next == numpy_next
+
+
+def test_compiled_greedy_fails_like_numpy(monkeypatch):
+	# RHS node 1 reserves LHS node 0, which is the only neighbour left to the arrival of RHS node 0
+	G = GraphAP(dataset_path(100), use_cache=False)
+	G.sorted_edges[G.n][:] = 0
+	monkeypatch.setattr(G, "_solve_known_subproblem", lambda delta, rng: (np.array([0]), np.array([1])))
+	monkeypatch.setattr(Kernels, "ENABLED", True)
+
+	with pytest.raises(Exception, match="match for node 100 not found"):
+		main.semionline(G, 0.5, np.random.RandomState(1))
+	with pytest.raises(Exception, match="match for node 100 not found"):
+		main.semionline_batch(G, 0.5, [np.random.RandomState(1)])
@@ -0,0 +1,37 @@
+import os
+import sys
+import json
+import shutil
+import subprocess
+from conftest import dataset_path
+
+MAIN = os.path.join(os.path.dirname(__file__), "..", "src", "main.py")
+
+
+## Output: dictionary phase -> total calls over the report
+def get_phase_calls(report):
+	calls = {}
+	for record in report:
+		for phase, entry in record["phases"].items():
+			calls[phase] = calls.get(phase, 0) + entry["calls"]
+	return calls
+
+
+def test_parallel_profile_reports_the_prewarm_once(tmp_path):
+	datasets = tmp_path / "datasets"
+	datasets.mkdir()
+	for n in (100, 200):
+		shutil.copy(dataset_path(n), datasets)
+	report_path = tmp_path / "profile.json"
+
+	subprocess.run([sys.executable, MAIN, "semionline", str(datasets), "-s", "5", "-j", "2", "--profile", str(report_path)],
+		check=True, stdout=subprocess.DEVNULL)
+
+	with open(report_path) as f:
+		report = json.load(f)
+	calls = get_phase_calls(report)
+
+	# The parent parses each file once, the workers only read the binary caches
+	assert calls["parse"] == 2
+	assert calls["load_cache"] == 2
+	assert sorted(record["file"] for record in report if "parse" in record["phases"]) == ["metric100.txt", "metric200.txt"]
@@ -0,0 +1,163 @@
+import io
+import contextlib
+import main
+from results_compiler import CompileState, update_db_source, update_text_source
+from modules.ResultsStore import ResultsStore, Checkpoint
+from conftest import dataset_path
+
+DELTAS = [0, 0.25, 0.5, 0.75, 1]
+
+
+## Checkpoints the cells of two seeds in alternating batches (as two --jobs workers would)
+def save_interleaved(checkpoint, seeds, deltas):
+	for start in range(0, len(deltas), 2):
+		for seed in seeds:
+			cells = [(delta, seed / 10 + delta) for delta in deltas[start:start + 2]]
+			checkpoint.save("semionline", "metric100.txt", 100, [(seed, cells)])
+
+
+def get_counts(state):
+	return {(cell["delta"], tuple(cell["seeds"])): cell["count"] for cell in state.summarize()}
+
+
+def test_interleaved_checkpoints_are_compiled_completely(tmp_path):
+	db_path = str(tmp_path / "results.db")
+	checkpoint = Checkpoint(db_path)
+	save_interleaved(checkpoint, [1, 2], DELTAS)
+
+	with ResultsStore(db_path) as store:
+		state = CompileState([store.db_path])
+		assert update_db_source(state, store)
+
+	assert get_counts(state) == {(delta, (1, 2)): 2 for delta in DELTAS}
+	ratios = {cell["delta"]: cell["ratio"] for cell in state.summarize()}
+	assert all(abs(ratios[delta] - (0.15 + delta)) < 1e-12 for delta in DELTAS)
+
+
+def test_compile_during_a_sweep_reads_the_rest_later(tmp_path):
+	db_path = str(tmp_path / "results.db")
+	checkpoint = Checkpoint(db_path)
+
+	with ResultsStore(db_path) as store:
+		state = CompileState([store.db_path])
+		save_interleaved(checkpoint, [1, 2], DELTAS[:2])
+		assert update_db_source(state, store)
+		save_interleaved(checkpoint, [1, 2], DELTAS[2:])
+		assert update_db_source(state, store)
+
+		# Storing the same cells again (e.g. the final save of a seed) adds nothing
+		checkpoint.save("semionline", "metric100.txt", 100, [(1, [(0, 0.1)])])
+		assert update_db_source(state, store)
+
+	assert get_counts(state) == {(delta, (1, 2)): 2 for delta in DELTAS}
+
+
+def test_overwritten_cells_replace_the_compiled_ones(tmp_path):
+	db_path = str(tmp_path / "results.db")
+	with ResultsStore(db_path) as store:
+		store.insert_result("metric100.txt", 100, 1, "semionline", [(0, 1.5), (0.5, 1.2)])
+		state = CompileState([store.db_path])
+		assert update_db_source(state, store)
+
+		# Without overwrite, stored cells are kept
+		store.insert_result("metric100.txt", 100, 1, "semionline", [(0, 9.0)])
+		assert store.get_cells("semionline", "metric100.txt", 1)[(0, None, None)] == (0, 1.5)
+		assert store.get_stored_seeds("semionline", "metric100.txt", [1, 2]) == {1}
+
+		# Replaced rows are deleted, so the incremental compile has to rebuild its state
+		store.insert_results([("metric100.txt", 100, 1, "semionline", [(0, 1.4)], 2.0)], overwrite=True)
+		assert not update_db_source(state, store)
+
+		state = CompileState([store.db_path])
+		assert update_db_source(state, store)
+
+	ratios = {cell["delta"]: (cell["count"], cell["ratio"]) for cell in state.summarize()}
+	assert ratios == {0: (1, 1.4), 0.5: (1, 1.2)}
+
+
+## Output: text results chunk of a seed (same format as main.store_result)
+def get_text_chunk(seed, deltas=DELTAS):
+	rows = "".join(f"{delta}\t\t{seed / 10 + delta}\n" for delta in deltas)
+	return f"> metric100.txt | 01 January 2024, 00:00:00 | Seed={seed} | n=100\n{rows}"
+
+
+## Compiles a text results file from scratch
+def compile_text(file_path):
+	state = CompileState([str(file_path)])
+	assert update_text_source(state, str(file_path))
+	return state
+
+
+def test_text_compile_reads_appended_seeds(tmp_path):
+	file_path = tmp_path / "results.txt"
+	file_path.write_text(get_text_chunk(1))
+	state = compile_text(file_path)
+	assert state.marks[str(file_path)]["offset"] == file_path.stat().st_size
+
+	with open(file_path, "a") as f:
+		f.write(get_text_chunk(2))
+	assert update_text_source(state, str(file_path))
+	assert get_counts(state) == get_counts(compile_text(file_path)) == {(delta, (1, 2)): 2 for delta in DELTAS}
+
+	# Nothing new: the state is unchanged
+	assert update_text_source(state, str(file_path))
+	assert get_counts(state) == {(delta, (1, 2)): 2 for delta in DELTAS}
+
+
+def test_text_compile_detects_rewritten_files(tmp_path):
+	file_path = tmp_path / "results.txt"
+	file_path.write_text(get_text_chunk(1) + get_text_chunk(2))
+	state = compile_text(file_path)
+
+	# Truncated
+	file_path.write_text(get_text_chunk(1))
+	assert not update_text_source(state, str(file_path))
+
+	# Same size, different content
+	state = compile_text(file_path)
+	file_path.write_text(get_text_chunk(3))
+	assert not update_text_source(state, str(file_path))
+
+
+def test_text_compile_detects_rows_appended_to_a_compiled_seed(tmp_path):
+	file_path = tmp_path / "results.txt"
+	file_path.write_text(get_text_chunk(1, DELTAS[:3]))
+	state = compile_text(file_path)
+
+	with open(file_path, "a") as f:
+		f.write(get_text_chunk(1, DELTAS[3:]).split("\n", 1)[1])
+	assert not update_text_source(state, str(file_path))
+	assert get_counts(compile_text(file_path)) == {(delta, (1,)): 1 for delta in DELTAS}
+
+
+def test_text_compile_leaves_an_unterminated_seed_for_later(tmp_path):
+	file_path = tmp_path / "results.txt"
+	chunk = get_text_chunk(2)
+	file_path.write_text(get_text_chunk(1) + chunk[:-1])		# Last line still being written
+	state = compile_text(file_path)
+	assert get_counts(state) == {(delta, (1,)): 1 for delta in DELTAS}
+
+	with open(file_path, "a") as f:
+		f.write("\n")
+	assert update_text_source(state, str(file_path))
+	assert get_counts(state) == {(delta, (1, 2)): 2 for delta in DELTAS}
+
+
+def test_resumed_seeds_have_no_runtime(tmp_path, monkeypatch):
+	db_path = str(tmp_path / "results.db")
+
+	# Interrupted run: seed 1 stopped after 2 cells
+	Checkpoint(db_path).save("semionline", "metric100.txt", 100, [(1, [(0, 1.0), (0.25, 1.3)])])
+
+	checkpoint = Checkpoint(db_path, resume=True)
+	monkeypatch.setattr(main, "checkpoint", checkpoint)
+	task = ("semionline", dataset_path(100), [1, 2], False, False)
+	with contextlib.redirect_stdout(io.StringIO()):
+		results, runtimes, _, _ = main.run_task(task)
+
+	assert runtimes[0] is None and runtimes[1] > 0
+	with ResultsStore(db_path) as store:
+		main.store_results(store, task, results, runtimes)
+		rows = store.connection.execute("SELECT seed, COUNT(*), COUNT(runtime) FROM results GROUP BY seed").fetchall()
+		assert store.get_cells("semionline", "metric100.txt", 1)[(0.25, None, None)] == (0.25, 1.3)
+	assert rows == [(1, 5, 0), (2, 5, 5)]
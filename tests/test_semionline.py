@@ -0,0 +1,49 @@
+import io
+import contextlib
+import pytest
+import numpy as np
+import main
+from modules.GraphAP import GraphAP
+from conftest import dataset_path
+
+SEEDS = [2344367245, 11, 637534]
+
+
+@pytest.fixture(scope="module")
+def graph():
+	return GraphAP(dataset_path(100), use_cache=False)
+
+
+@pytest.mark.parametrize("rng_mode", ["legacy", "stream"])
+def test_batch_matches_scalar_semionline(graph, rng_mode, monkeypatch):
+	monkeypatch.setattr(main, "RNG_MODE", rng_mode)
+	for delta in main.FINE_DELTA_OPTIONS:
+		rngs = [main.get_rng(graph, seed, delta, independent=True) for seed in SEEDS]
+		matchings, matched = main.semionline_batch(graph, delta, rngs)
+		assert matched.all()
+
+		for s, seed in enumerate(SEEDS):
+			graph.flush()
+			matching = main.semionline(graph, delta, main.get_rng(graph, seed, delta))
+			expected = [matching[v] for v in range(graph.n, 2 * graph.n)]
+			np.testing.assert_array_equal(matchings[s], expected)
+
+
+@pytest.mark.parametrize("rng_mode", ["legacy", "stream"])
+def test_batch_matches_scalar_simulation(graph, rng_mode, monkeypatch):
+	monkeypatch.setattr(main, "RNG_MODE", rng_mode)
+	with contextlib.redirect_stdout(io.StringIO()):
+		expected = [main.simulate_semionline(graph, seed) for seed in SEEDS]
+		assert main.simulate_semionline_batch(graph, SEEDS) == expected
+
+
+def test_unmatched_arrival_fails_in_both_paths(monkeypatch):
+	# RHS node 1 reserves LHS node 0, which is the only neighbour left to the arrival of RHS node 0
+	G = GraphAP(dataset_path(100), use_cache=False)
+	G.sorted_edges[G.n][:] = 0
+	monkeypatch.setattr(G, "_solve_known_subproblem", lambda delta, rng: (np.array([0]), np.array([1])))
+
+	with pytest.raises(Exception, match="match for node 100 not found"):
+		main.semionline(G, 0.5, np.random.RandomState(1))
+	with pytest.raises(Exception, match="match for node 100 not found"):
+		main.semionline_batch(G, 0.5, [np.random.RandomState(1)])